@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    """Миниатюры нарезаются сразу, в потоке запроса.
+
+    Иначе фоновые потоки дописывали бы файлы во временный
+    MEDIA_ROOT, который тест в это время уже удаляет.
+    """
+    settings.THUMBNAIL_WORKERS = 0
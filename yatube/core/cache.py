@@ -0,0 +1,115 @@
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.cache import CacheMiddleware
+
+from . import holes, metrics
+from .conditional import not_modified, page_validators, set_validators
+
+VERSION_KEY = 'listing-version:{}'
+
+# Попадания, промахи и ответы 304 кеша страниц по пространствам имён.
+stats = Counter()
+
+
+def _version_keys(namespace, scope=None):
+    keys = [VERSION_KEY.format(namespace)]
+    if scope is not None:
+        keys.append(VERSION_KEY.format(f'{namespace}:{scope}'))
+    return keys
+
+
+def _now():
+    return int(time.time() * 10 ** 6)
+
+
+def get_versions(namespace, scope=None):
+    """Версии пространства имён и области внутри него.
+
+    Версия — время последнего изменения в микросекундах, поэтому
+    её можно использовать и как отметку Last-Modified.
+    """
+    keys = _version_keys(namespace, scope)
+    versions = cache.get_many(keys)
+    missing = {key: _now() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(namespace, scope=None):
+    """Сбрасывает кеш пространства имён или одной его области."""
+    cache.set(_version_keys(namespace, scope)[-1], _now(), None)
+
+
+def listing_validators(namespace, scope=None):
+    """Части ETag и Last-Modified списка по его версиям."""
+    versions = get_versions(namespace, scope)
+    return (namespace, *versions), max(versions) // 10 ** 6
+
+
+def personalize(request, response, etag, last_modified):
+    """Достраивает общую копию страницы для текущего пользователя."""
+    if response.status_code != 200 or response.streaming:
+        return response
+    content = holes.fill(request, response.content.decode(response.charset))
+    response.content = content
+    if response.has_header('Content-Length'):
+        response['Content-Length'] = len(response.content)
+    set_validators(response, etag, last_modified)
+    # Копия в браузере своя у каждого и проверяется по ETag.
+    response['Cache-Control'] = 'private, no-cache'
+    if response.has_header('Expires'):
+        del response['Expires']
+    return response
+
+
+def cache_listing(namespace, scope_kwarg=None):
+    """Кеширует одну общую копию страницы до изменения её версии.
+
+    Ключ включает версии, которые сигналы моделей сдвигают при
+    изменении данных, поэтому время жизни можно делать большим.
+    Страница отрисовывается с метками вместо фрагментов, зависящих
+    от пользователя ({% hole %}), и хранится одна на URL; метки
+    заполняются при каждом запросе, так что гости и авторизованные
+    пользователи попадают в одну и ту же запись кеша.
+    По версиям же отдаются ETag и Last-Modified: клиент с
+    актуальной копией получает 304 без обращения к кешу страниц.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scope = kwargs.get(scope_kwarg) if scope_kwarg else None
+            parts, last_modified = listing_validators(namespace, scope)
+            etag, last_modified = page_validators(
+                request, parts, last_modified
+            )
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                stats[namespace, 'not_modified'] += 1
+                metrics.count('page_not_modified')
+                return response
+            middleware = CacheMiddleware(
+                cache_timeout=settings.LISTING_CACHE_TIMEOUT,
+                key_prefix='.'.join(map(str, parts)),
+            )
+            response = middleware.process_request(request)
+            if response is not None:
+                stats[namespace, 'hit'] += 1
+                metrics.count('page_hit')
+            else:
+                stats[namespace, 'miss'] += 1
+                metrics.count('page_miss')
+                request.punch_holes = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.punch_holes = False
+                response = middleware.process_response(request, response)
+            return personalize(request, response, etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,72 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .routers import pin_if_recent
+
+
+def page_validators(request, parts, last_modified):
+    """Слабый ETag и Last-Modified страницы.
+
+    Кроме данных страницы ETag учитывает пользователя (шапка и кнопки
+    у каждого свои) и полный путь с курсором или номером страницы.
+    Дата пользователя не различает, поэтому авторизованным она
+    не отдаётся: иначе после входа If-Modified-Since вернул бы 304
+    на гостевую копию.
+    Только что изменённая страница строится по основной базе:
+    иначе под новым ETag оказались бы данные отстающей реплики.
+    """
+    pin_if_recent(last_modified)
+    key = ':'.join(
+        map(str, (*parts, request.user.pk or 0, request.get_full_path()))
+    )
+    etag = f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+    if request.user.is_authenticated:
+        last_modified = None
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Ответ 304 (или 412), если у клиента актуальная копия."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.setdefault('Last-Modified', http_date(last_modified))
+    patch_vary_headers(response, ('Cookie',))
+
+
+def conditional_page(validators):
+    """Отвечает 304 до вызова представления, если страница не менялась.
+
+    validators(request, *args, **kwargs) возвращает (части ETag,
+    Last-Modified в секундах) по дешёвым данным — версиям кеша,
+    отметкам времени и счётчикам — или None, если проверить нельзя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = page_validators(request, *result)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,51 @@
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+MARKER = '<!--hole:{name}:{args}-->'
+MARKER_RE = re.compile(r'<!--hole:(\w+):([\w-]*)-->')
+
+# Имя дыры -> (шаблон, функция контекста или None).
+registry = {}
+
+
+def register(name, template, context=None):
+    """Объявляет фрагмент страницы, который у каждого пользователя свой.
+
+    context(request, **kwargs) возвращает контекст шаблона; без неё
+    контекстом служат сами аргументы тега {% hole %}.
+    """
+    registry[name] = (template, context)
+
+
+def render(request, name, **kwargs):
+    template, get_context = registry[name]
+    context = get_context(request, **kwargs) if get_context else kwargs
+    return render_to_string(template, context, request)
+
+
+def marker(name, **kwargs):
+    """Метка на месте фрагмента в общей для всех копии страницы."""
+    args = base64.urlsafe_b64encode(json.dumps(kwargs).encode())
+    return MARKER.format(name=name, args=args.decode().rstrip('='))
+
+
+def fill(request, content):
+    """Заполняет метки фрагментами для текущего пользователя.
+
+    Текст постов экранируется при отрисовке, поэтому подделать метку
+    через содержимое страницы нельзя.
+    """
+    def replace(match):
+        args = match.group(2)
+        kwargs = json.loads(
+            base64.urlsafe_b64decode(args + '=' * (-len(args) % 4))
+        )
+        return render(request, match.group(1), **kwargs)
+    return MARKER_RE.sub(replace, content)
+
+
+register('header', 'includes/header.html')
+register('switcher', 'includes/switcher.html')
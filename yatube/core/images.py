@@ -0,0 +1,121 @@
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageFilter, ImageOps
+
+# Форматы, в которых оригинал пересохраняется; остальные — в JPEG.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+    'GIF': {},
+}
+PLACEHOLDER_SIZE = 16
+# Метаданные из Image.info, которые не переносятся в сохранённый файл.
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+# Форматы, где несколько кадров — анимация. В MPO с камер телефонов
+# второй кадр — превью или стереопара, и сохраняется только первый.
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+EXTENSIONS = {
+    'JPEG': ('.jpg', '.jpeg'),
+    'PNG': ('.png',),
+    'WEBP': ('.webp',),
+    'GIF': ('.gif',),
+}
+
+
+def read_size(file):
+    """Размеры картинки по заголовку файла, без декодирования."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return image.size
+    finally:
+        file.seek(0)
+
+
+def check_size(file):
+    """Отклоняет картинки, распаковка которых займёт слишком много памяти."""
+    try:
+        width, height = read_size(file)
+    except Image.DecompressionBombError:
+        width = height = None
+    limit = settings.IMAGE_MAX_PIXELS
+    if width is None or width * height > limit:
+        raise ValidationError(
+            'Изображение слишком большое: не больше %(limit)s пикселей.',
+            code='too_large',
+            params={'limit': limit},
+        )
+    return width, height
+
+
+def ingest(file):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE и убирает метаданные.
+
+    Картинка пересохраняется без EXIF, повёрнутой по его ориентации.
+    Анимированные GIF, PNG и WebP сохраняются как есть, чтобы не
+    потерять кадры.
+    """
+    check_size(file)
+    with Image.open(file) as source:
+        animated = getattr(source, 'is_animated', False)
+        if animated and source.format in ANIMATED_FORMATS:
+            file.seek(0)
+            return file
+        image_format = source.format
+        image = ImageOps.exif_transpose(source)
+        image.load()
+        icc_profile = source.info.get('icc_profile')
+    # Иначе PNG и WebP записали бы EXIF и XMP из info обратно.
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    if image_format not in SAVE_OPTIONS:
+        image_format = 'JPEG'
+    max_side = settings.IMAGE_MAX_SIDE
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = dict(SAVE_OPTIONS[image_format])
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    name, extension = os.path.splitext(os.path.basename(file.name))
+    if extension.lower() not in EXTENSIONS[image_format]:
+        extension = EXTENSIONS[image_format][0]
+    return ContentFile(buffer.getvalue(), name=name + extension)
+
+
+def describe(file):
+    """Размеры, основной цвет и размытая заглушка картинки.
+
+    Заглушка — JPEG со стороной PLACEHOLDER_SIZE в виде data URI:
+    её можно встроить в страницу, пока грузится сама картинка.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        # JPEG декодируется сразу в уменьшенном виде.
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        small = image.convert('RGB')
+    file.seek(0)
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+    paletted = small.quantize(colors=4)
+    _, index = max(paletted.getcolors())
+    red, green, blue = paletted.getpalette()[index * 3:index * 3 + 3]
+    buffer = BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'JPEG', quality=40
+    )
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return {
+        'width': width,
+        'height': height,
+        'color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': f'data:image/jpeg;base64,{encoded}',
+    }
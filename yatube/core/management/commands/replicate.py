@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import ReplicationError, replica_aliases, replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики: замена репликации '
+        'для проверки маршрутизации чтения на одной машине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Алиасы реплик из DATABASES; по умолчанию все, '
+                 'кроме default.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование через столько секунд; '
+                 'это и будет отставание реплик.',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replica_aliases()
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                try:
+                    target = replicate(alias)
+                except ReplicationError as error:
+                    raise CommandError(str(error))
+                self.stdout.write(
+                    f'{alias}: {target} за '
+                    f'{time.perf_counter() - started:.2f} с'
+                )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+# Границы корзин гистограммы времени ответа, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    __slots__ = ('queries', 'db', 'template', 'depth', 'events')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.depth = 0
+        self.events = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def count(event, amount=1):
+    """Отмечает событие (попадание в кеш, поиск миниатюр) в запросе."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.events[event] += amount
+
+
+def install():
+    """Замеряет отрисовку шаблонов внутри запросов.
+
+    Время берётся только у внешнего вызова: шаблоны, отрисованные
+    изнутри другого (карточки, фрагменты), уже входят в его время.
+    """
+    from django.template.backends.django import Template
+    original = Template.render
+    if getattr(original, 'timed', False):
+        return
+
+    @wraps(original)
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        metrics.depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.depth -= 1
+            if not metrics.depth:
+                metrics.template += time.perf_counter() - started
+
+    render.timed = True
+    Template.render = render
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'total', 'requests', 'queries', 'db',
+                 'template', 'events')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.requests = 0
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.events = Counter()
+
+
+class Registry:
+    """Накопленные замеры по представлениям в пределах процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def observe(self, view, elapsed, metrics):
+        with self.lock:
+            stats = self.views[view]
+            for index, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[index] += 1
+            stats.total += elapsed
+            stats.requests += 1
+            stats.queries += metrics.queries
+            stats.db += metrics.db
+            stats.template += metrics.template
+            stats.events.update(metrics.events)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                view: (list(stats.buckets), stats.total, stats.requests,
+                       stats.queries, stats.db, stats.template,
+                       Counter(stats.events))
+                for view, stats in self.views.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = Registry()
+
+
+def server_timing(metrics, elapsed):
+    """Значение заголовка Server-Timing."""
+    parts = [
+        f'db;dur={metrics.db * 1000:.2f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template * 1000:.2f}',
+    ]
+    parts.extend(
+        f'{event};desc="{amount}"'
+        for event, amount in sorted(metrics.events.items())
+    )
+    parts.append(f'total;dur={elapsed * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос и отдаёт замеры в Server-Timing.
+
+    Запросы к базе считаются через execute_wrapper, шаблоны — обёрткой
+    из install(), события — через count(). Итоги копятся в registry
+    по имени представления и отдаются на /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.observe(view, elapsed, metrics)
+        response['Server-Timing'] = server_timing(metrics, elapsed)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')
+
+
+def _labels(**labels):
+    return ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def _family(lines, name, kind, description, samples):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} {kind}')
+    for suffix, labels, value in samples:
+        labels = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}{suffix}{labels} {value}')
+
+
+def exposition():
+    """Замеры в текстовом формате Prometheus."""
+    from . import thumbnails
+    from .cache import stats as cache_stats
+
+    views = sorted(registry.snapshot().items())
+    lines = []
+    histogram = []
+    for view, (buckets, total, requests, *_) in views:
+        for bound, amount in zip(BUCKETS, buckets):
+            histogram.append(
+                ('_bucket', _labels(view=view, le=bound), amount)
+            )
+        histogram.append(('_bucket', _labels(view=view, le='+Inf'), requests))
+        histogram.append(('_sum', _labels(view=view), round(total, 6)))
+        histogram.append(('_count', _labels(view=view), requests))
+    _family(lines, 'yatube_request_duration_seconds', 'histogram',
+            'Время ответа по представлениям.', histogram)
+    for index, name, description in (
+        (3, 'yatube_db_queries_total', 'Запросы к базе.'),
+        (4, 'yatube_db_seconds_total', 'Время в базе.'),
+        (5, 'yatube_template_seconds_total', 'Время отрисовки шаблонов.'),
+    ):
+        _family(lines, name, 'counter', description, [
+            ('', _labels(view=view), round(values[index], 6))
+            for view, values in views
+        ])
+    _family(lines, 'yatube_events_total', 'counter',
+            'События запросов: кеш, поиск миниатюр.', [
+                ('', _labels(view=view, event=event), amount)
+                for view, values in views
+                for event, amount in sorted(values[6].items())
+            ])
+    _family(lines, 'yatube_page_cache_total', 'counter',
+            'Кеш страниц по пространствам имён.', [
+                ('', _labels(namespace=namespace, outcome=outcome), amount)
+                for (namespace, outcome), amount
+                in sorted(cache_stats.items())
+            ])
+    queue = thumbnails.queue.metrics()
+    for key, kind in (
+        ('queue_depth', 'gauge'), ('generated', 'counter'),
+        ('failed', 'counter'), ('dropped', 'counter'),
+        ('latency_seconds_total', 'counter'),
+        ('latency_seconds_max', 'gauge'),
+    ):
+        name = f'yatube_thumbnail_{key}'
+        if kind == 'counter' and not key.endswith('_total'):
+            name += '_total'
+        _family(lines, name, kind, 'Очередь миниатюр.',
+                [('', '', queue[key])])
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    """Можно ли отдавать замеры этому клиенту."""
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
@@ -0,0 +1,197 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+
+# Кадры этих модулей — обвязка замеров и маршрутизации,
+# а не источник запроса.
+SKIPPED_FILES = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('queries.py', 'metrics.py', 'routers.py')
+}
+
+Repeated = namedtuple('Repeated', 'fingerprint count duplicates site')
+
+
+class RepeatedQueries(Exception):
+    """Запрос страницы повторялся чаще допустимого."""
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Текст запроса без значений: одинаков для всех повторов N+1."""
+    sql = ' '.join(sql.split())
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return IN_LIST.sub('IN (...)', sql.replace('%s', '?'))
+
+
+def _in_project(filename):
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in filename
+        and filename not in SKIPPED_FILES
+    )
+
+
+def call_site():
+    """Ближайшие к запросу строка шаблона или кадр кода проекта."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return (
+                    f'{origin.template_name}:{token.lineno} '
+                    f'{{{token.contents}}}'
+                )
+        filename = frame.f_code.co_filename
+        if _in_project(filename):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'неизвестно'
+
+
+class QueryLog:
+    """Считает запросы по отпечаткам через execute_wrapper.
+
+    Место вызова определяется только на пороговом повторе: разбор
+    стека дорогой, а для остальных запросов не нужен.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.total = 0
+        self.counts = Counter()
+        self.exact = Counter()
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.total += 1
+        self.counts[key] += 1
+        self.exact[sql, str(params)] += 1
+        if self.counts[key] == self.threshold:
+            self.sites[key] = call_site()
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """Отпечатки, повторившиеся threshold раз и больше."""
+        duplicates = Counter()
+        for (sql, _), amount in self.exact.items():
+            duplicates[fingerprint(sql)] += amount - 1
+        return sorted(
+            (
+                Repeated(key, amount, duplicates[key], self.sites[key])
+                for key, amount in self.counts.items()
+                if amount >= self.threshold
+            ),
+            key=lambda repeated: -repeated.count,
+        )
+
+
+def describe(repeated):
+    return (
+        f'{repeated.count} раз ({repeated.duplicates} точных повторов) '
+        f'из {repeated.site}: {repeated.fingerprint}'
+    )
+
+
+# Активные бюджеты query_budget.
+_budgets = []
+
+
+class RepeatedQueriesMiddleware:
+    """Ищет N+1 и повторы запросов на каждой странице.
+
+    Отпечатки, повторившиеся QUERY_REPEAT_THRESHOLD раз, пишутся
+    в журнал с местом вызова, а при QUERY_REPEAT_RAISE — поднимают
+    RepeatedQueries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog(settings.QUERY_REPEAT_THRESHOLD)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        for budget in _budgets:
+            budget.record(view, log)
+        repeated = log.repeated()
+        for item in repeated:
+            logger.warning(
+                'Повтор запроса на %s %s', request.path, describe(item)
+            )
+        if repeated and settings.QUERY_REPEAT_RAISE:
+            raise RepeatedQueries(
+                f'{request.path}: ' + '; '.join(map(describe, repeated))
+            )
+        return response
+
+
+class Budget:
+    def __init__(self, limits, repeats):
+        self.limits = limits
+        self.repeats = repeats
+        self.seen = set()
+        self.errors = []
+
+    def record(self, view, log):
+        self.seen.add(view)
+        limit = self.limits.get(view)
+        if limit is not None and log.total > limit:
+            self.errors.append(
+                f'{view}: {log.total} запросов при бюджете {limit}'
+            )
+        if self.repeats:
+            self.errors.extend(
+                f'{view}: {describe(item)}' for item in log.repeated()
+            )
+
+
+def query_budget(limits, repeats=True):
+    """Декоратор теста: страницы укладываются в бюджет запросов.
+
+    limits — {имя представления: наибольшее число запросов одного
+    ответа}. Тест падает, если бюджет превышен, если представление
+    из limits ни разу не вызывалось или, при repeats, если на
+    странице нашёлся повтор запроса.
+    """
+    def decorator(test):
+        @wraps(test)
+        def wrapper(case, *args, **kwargs):
+            budget = Budget(limits, repeats)
+            _budgets.append(budget)
+            try:
+                result = test(case, *args, **kwargs)
+            finally:
+                _budgets.remove(budget)
+            budget.errors.extend(
+                f'{view}: не вызывалось'
+                for view in limits if view not in budget.seen
+            )
+            if budget.errors:
+                case.fail('\n'.join(budget.errors))
+            return result
+        return wrapper
+    return decorator
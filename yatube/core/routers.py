@@ -0,0 +1,144 @@
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Pin:
+    """Читает ли текущий запрос из основной базы и писал ли он."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_current = ContextVar('replica_pin', default=None)
+
+
+def pin():
+    """Читать из основной базы до конца запроса."""
+    state = _current.get()
+    if state is not None:
+        state.pinned = True
+
+
+def pin_if_recent(last_modified):
+    """Закрепляет основную базу, если данные менялись совсем недавно.
+
+    Реплики могут ещё не знать об изменении, а ETag и общая копия
+    страницы строятся по свежим версиям кеша.
+    """
+    if (last_modified is not None
+            and time.time() - last_modified < settings.REPLICA_PIN_SECONDS):
+        pin()
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную базу, чтение в запросе — в случайную реплику.
+
+    Из основной базы читают вне запроса (команды, фоновые потоки),
+    внутри транзакции, при небезопасном методе, после записи в этом
+    же запросе и ещё REPLICA_PIN_SECONDS секунд после неё.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (state is None or state.pinned or not settings.DATABASE_REPLICAS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pinned_until(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+class ReplicaPinMiddleware:
+    """Отправляет чтение посетителя в основную базу после его записи.
+
+    Срок закрепления хранится в cookie, а не в сессии: сессию
+    саму читают до того, как становится известно, куда читать.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = Pin(
+            request.method not in SAFE_METHODS
+            or _pinned_until(request) > time.time()
+        )
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                f'{time.time() + settings.REPLICA_PIN_SECONDS:.3f}',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ReplicationError(Exception):
+    """Реплику нельзя обновить копированием файла SQLite."""
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def copy_primary(target):
+    """Копирует основную базу в файл target через backup API SQLite.
+
+    Копия пишется во временный файл и подменяет target целиком:
+    новые соединения видят либо прежний снимок, либо новый.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    temporary = f'{target}.tmp'
+    with closing(sqlite3.connect(temporary)) as copy:
+        primary.connection.backup(copy)
+    os.replace(temporary, target)
+
+
+def replicate(alias):
+    """Обновляет реплику alias снимком основной базы."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    replica = connections[alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+        raise ReplicationError('Копируются только базы SQLite')
+    target = replica.settings_dict['NAME']
+    if (target == primary.settings_dict['NAME']
+            or replica.is_in_memory_db()):
+        raise ReplicationError(f'{alias} — не отдельный файл базы')
+    copy_primary(target)
+    return target
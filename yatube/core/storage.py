@@ -0,0 +1,59 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_LENGTH = 64
+HASHED_NAME = re.compile(
+    r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{%d}(?:\.\w+)?$' % HASH_LENGTH
+)
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    """Лежит ли файл уже по адресу своего содержимого."""
+    return bool(HASHED_NAME.search(name))
+
+
+@deconstructible
+class HashedStorage(FileSystemStorage):
+    """Файлы именуются по SHA-256 содержимого.
+
+    posts/photo.jpg сохраняется как posts/ab/cd/abcd….jpg: два уровня
+    каталогов по префиксу хеша держат каталоги небольшими, а
+    одинаковые загрузки попадают в один и тот же файл.
+    """
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое: суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # Пишем во временный файл и переносим атомарно: параллельная
+        # загрузка того же содержимого просто перезапишет его копией.
+        temporary = super().get_available_name(f'{name}.upload')
+        temporary = super()._save(temporary, content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
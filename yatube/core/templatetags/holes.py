@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    """Фрагмент, зависящий от пользователя.
+
+    При отрисовке страницы для общего кеша вместо фрагмента ставится
+    метка, которую cache_listing заполняет при каждом запросе.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(holes.marker(name, **kwargs))
+    return mark_safe(holes.render(request, name, **kwargs))
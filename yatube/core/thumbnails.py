@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Все варианты картинки нарезаны; аргумент image — файл поля.
+thumbnails_ready = Signal()
+
+
+class ThumbnailQueue:
+    """Ограниченный пул потоков для заблаговременной нарезки миниатюр.
+
+    После загрузки картинки все варианты из variants() создаются
+    в фоне, и страницы находят готовые записи в хранилище ключей.
+    Когда варианты готовы, отправляется сигнал thumbnails_ready.
+    Если очередь переполнена, задача отбрасывается, и картинку снова
+    поставит в очередь показ, не нашедший её миниатюр, — не чаще
+    раза в THUMBNAIL_PENDING_TIMEOUT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.depth = 0
+        self.generated = 0
+        self.failed = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.THUMBNAIL_WORKERS,
+                    thread_name_prefix='thumbnails',
+                )
+            return self._executor
+
+    def submit(self, image):
+        """Ставит нарезку в очередь; False, если очередь заполнена.
+
+        Передаётся сам файл поля, а не имя: ключ миниатюры зависит
+        от хранилища исходника.
+        """
+        with self._lock:
+            if self.depth >= settings.THUMBNAIL_QUEUE_SIZE:
+                self.dropped += 1
+                return False
+            self.depth += 1
+        if settings.THUMBNAIL_WORKERS == 0:
+            self._generate(image, in_worker=False)
+        else:
+            self._get_executor().submit(self._generate, image)
+        return True
+
+    def _generate(self, image, in_worker=True):
+        started = time.perf_counter()
+        try:
+            for geometry, options in variants():
+                get_thumbnail(image, geometry, **options)
+            if isinstance(default.kvstore, KVStore):
+                default.kvstore.cache.delete(_pending_key(image))
+            thumbnails_ready.send(sender=self.__class__, image=image)
+        except Exception:
+            logger.exception('Не удалось нарезать миниатюры для %s', image)
+            failed = True
+        else:
+            failed = False
+        finally:
+            if in_worker:
+                close_old_connections()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.depth -= 1
+            if failed:
+                self.failed += 1
+                return
+            self.generated += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self.depth,
+                'generated': self.generated,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'latency_seconds_total': self.latency_total,
+                'latency_seconds_max': self.latency_max,
+            }
+
+
+queue = ThumbnailQueue()
+
+
+def variants():
+    """Размеры и форматы миниатюр: каждый размер в каждом формате.
+
+    WebP пропускается, если Pillow собран без его поддержки.
+    """
+    formats = [
+        image_format for image_format in settings.THUMBNAIL_FORMATS
+        if image_format != 'WEBP' or features.check('webp')
+    ]
+    return [
+        (geometry, {**options, 'format': image_format})
+        for geometry, options in settings.THUMBNAIL_GEOMETRIES
+        for image_format in formats
+    ]
+
+
+def _thumbnail_name(source, geometry, options):
+    """Имя файла миниатюры так же, как его считает get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def _pending_key(image):
+    return add_prefix(f'pending:{image.name}')
+
+
+def mark_pending(images):
+    """Помечает картинки поставленными в очередь нарезки.
+
+    Пока метка жива, resolve() не ищет их миниатюры в таблице
+    хранилища и не ставит картинки в очередь снова.
+    """
+    marks = {_pending_key(image): True for image in images}
+    if marks and isinstance(default.kvstore, KVStore):
+        default.kvstore.cache.set_many(
+            marks, settings.THUMBNAIL_PENDING_TIMEOUT
+        )
+
+
+def _lookup(keys, pending):
+    """Записи хранилища ключей и метки очереди одним get_many."""
+    if not isinstance(default.kvstore, KVStore):
+        # Хранилище без кеша перед таблицей: метки ставить некуда.
+        values = (
+            (key, default.kvstore._get_raw(key)) for key in keys
+        )
+        return {key: value for key, value in values if value is not None}
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many([*keys, *pending])
+    missing = [
+        key for key, (image, _) in keys.items()
+        if key not in found and _pending_key(image) not in found
+    ]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        kv_cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return found
+
+
+def resolve(images, specs):
+    """Миниатюры картинок: {имя картинки: [ImageFile для каждого spec]}.
+
+    Вместо отдельного обращения к хранилищу ключей на каждый
+    {% thumbnail %} все записи читаются одним get_many из кеша,
+    а недостающие — одним запросом к таблице хранилища. Картинки,
+    у которых чего-то нет и там, ставятся в очередь нарезки и
+    помечаются на THUMBNAIL_PENDING_TIMEOUT: пока метка жива, их
+    не ищут в таблице и не ставят в очередь снова, так что
+    нечитаемый исходник не стоит запросов на каждом показе.
+    Ненайденная миниатюра возвращается пустым ImageFile.
+    """
+    keys = {}
+    pending = {}
+    for image in images:
+        if image:
+            source = ImageFile(image)
+            pending[_pending_key(image)] = image
+            for geometry, options in specs:
+                thumbnail = ImageFile(
+                    _thumbnail_name(source, geometry, options),
+                    default.storage,
+                )
+                keys[add_prefix(thumbnail.key)] = (image, thumbnail)
+    metrics.count('thumb_lookup', len(keys))
+    found = _lookup(keys, pending)
+    resolved = {}
+    queued = {}
+    for key, (image, thumbnail) in keys.items():
+        value = found.get(key)
+        if value and value != EMPTY_VALUE:
+            thumbnail = deserialize_image_file(value)
+        else:
+            metrics.count('thumb_miss')
+            pending_key = _pending_key(image)
+            if pending_key not in found and pending_key not in queued:
+                queued[pending_key] = image
+                # Как и после загрузки: внутри транзакции — после неё.
+                transaction.on_commit(partial(queue.submit, image))
+        resolved.setdefault(image.name, []).append(thumbnail)
+    mark_pending(queued.values())
+    return resolved
+
+
+def attach(objects, field='image'):
+    """Кладёт в объекты миниатюры картинки из поля field.
+
+    obj.thumbnail — самый большой вариант в последнем из форматов
+    THUMBNAIL_FORMATS (для src), obj.srcset — {формат: srcset}.
+    """
+    specs = variants()
+    images = [getattr(obj, field) for obj in objects]
+    resolved = resolve(images, specs)
+    for obj, image in zip(objects, images):
+        obj.thumbnail = None
+        obj.srcset = {}
+        thumbnails = resolved.get(image.name) if image else None
+        if not thumbnails:
+            continue
+        for (geometry, options), thumbnail in zip(specs, thumbnails):
+            if not thumbnail.size:
+                # Миниатюра ещё в очереди или исходник не читается.
+                continue
+            obj.srcset.setdefault(options['format'].lower(), []).append(
+                f'{thumbnail.url} {thumbnail.width}w'
+            )
+            obj.thumbnail = thumbnail
+        obj.srcset = {
+            image_format: ', '.join(sources)
+            for image_format, sources in obj.srcset.items()
+        }
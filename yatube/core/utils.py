@@ -1,8 +1,261 @@
+import base64
+import hashlib
+import json
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject, cached_property
+
+POSTS_ORDERING = ('-pub_date', '-id')
+# Целые вне 64 бит база не примет: такой курсор считается подделанным.
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _table_estimate(model):
+    """Число строк таблицы по статистике ANALYZE (sqlite_stat1)."""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+def cheap_count(queryset):
+    """Число строк выборки без точного COUNT(*) на больших таблицах.
+
+    Меньше PAGINATOR_EXACT_COUNT_THRESHOLD строк считаются точно.
+    Для всей таблицы берётся оценка из sqlite_stat1, для остальных
+    выборок — COUNT(*), закешированный на PAGINATOR_COUNT_TIMEOUT.
+    """
+    threshold = settings.PAGINATOR_EXACT_COUNT_THRESHOLD
+    if not queryset.query.where:
+        estimate = _table_estimate(queryset.model)
+        if estimate is not None and estimate > threshold:
+            return estimate
+    sql = str(queryset.order_by().query).encode()
+    key = f'count:{hashlib.md5(sql).hexdigest()}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        if count > threshold:
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+    return count
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу сортировки вместо OFFSET и COUNT(*).
+
+    Курсор — непрозрачный токен с ключом крайней записи страницы,
+    направлением перехода и номером страницы.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, ordering=POSTS_ORDERING,
+                 count=None):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.max_offset_page = settings.PAGINATOR_MAX_OFFSET_PAGE
+        self._num_pages = 1
+        if count is not None:
+            self.count = count
+
+    @property
+    def num_pages(self):
+        """Страниц, известных по курсорам: текущая и, если есть, следующая."""
+        return self._num_pages
+
+    @cached_property
+    def count(self):
+        """Приблизительное число записей, только для навигации."""
+        return cheap_count(self.object_list)
+
+    def get_elided_page_range(self, number, on_each_side=3, on_ends=1):
+        """Номера страниц окна навигации с пропусками.
+
+        Общее число страниц оценивается по count, но не меньше уже
+        известного по курсорам.
+        """
+        total = max(ceil(self.count / self.per_page), self._num_pages)
+        if total <= (on_each_side + on_ends) * 2:
+            yield from range(1, total + 1)
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < total - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(total - on_ends + 1, total + 1)
+        else:
+            yield from range(number + 1, total + 1)
+
+    def _key_values(self, obj):
+        """Ключ записи (модели или строки values()) для JSON."""
+        opts = self.object_list.model._meta
+        values = []
+        for name in self.fields:
+            if isinstance(obj, dict):
+                value = obj[name]
+            else:
+                value = getattr(obj, opts.get_field(name).attname)
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return values
+
+    def _parse_key(self, values):
+        opts = self.object_list.model._meta
+        return self._check_range([
+            opts.get_field(name).to_python(value)
+            for name, value in zip(self.fields, values)
+        ])
+
+    @staticmethod
+    def _check_range(key):
+        """Ключ как есть; ValueError, если целое не влезет в столбец БД."""
+        if any(
+            isinstance(value, int) and value not in INTEGER_RANGE
+            for value in key
+        ):
+            raise ValueError('Ключ курсора вне диапазона')
+        return key
+
+    def encode_cursor(self, obj, direction, number):
+        payload = json.dumps([direction, number, self._key_values(obj)])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Возвращает (направление, номер, ключ) или None."""
+        try:
+            payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            direction, number, key = json.loads(payload)
+            key = self._parse_key(key)
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if (direction not in ('next', 'prev') or not isinstance(number, int)
+                or number < 1 or len(key) != len(self.fields)):
+            return None
+        return direction, number, key
+
+    def _seek(self, key, reverse):
+        """Условие «строго после ключа» в порядке выдачи."""
+        condition = Q()
+        for position in reversed(range(len(self.fields))):
+            name = self.fields[position]
+            descending = self.ordering[position].startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': key[position]})
+            if position < len(self.fields) - 1:
+                step |= Q(**{name: key[position]}) & condition
+            condition = step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], 'next', number + 1)
+            if has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], 'prev', number - 1)
+            if has_previous and rows and number > 1 else None
+        )
+        page.page_window = SimpleLazyObject(
+            lambda: list(self.get_elided_page_range(number))
+        )
+        return page
+
+    def _fetch(self, key, reverse, offset, limit):
+        """Строки после ключа (или с начала) в порядке выдачи.
+
+        При reverse=True выборка идёт в обратную сторону от ключа.
+        """
+        queryset = self.object_list
+        ordering = self.ordering
+        if reverse:
+            ordering = self._reversed_ordering()
+        if key is not None:
+            queryset = queryset.filter(self._seek(key, reverse))
+        return list(queryset.order_by(*ordering)[offset:offset + limit])
+
+    def cursor_page(self, token):
+        cursor = self.decode_cursor(token) if token else None
+        if cursor is None:
+            return self.offset_page(1)
+        direction, number, key = cursor
+        if direction == 'next':
+            rows = self._fetch(key, False, 0, self.per_page + 1)
+            has_next = len(rows) > self.per_page
+            return self._build_page(
+                rows[:self.per_page], number, has_next, True
+            )
+        rows = self._fetch(key, True, 0, self.per_page + 1)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not rows:
+            return self.offset_page(1)
+        # Сверху могли появиться новые записи: страница уже не первая.
+        number = max(number, 2) if has_previous else 1
+        return self._build_page(rows, number, True, has_previous)
+
+    def _offset_rows(self, number):
+        return self._fetch(
+            None, False, (number - 1) * self.per_page, self.per_page + 1
+        )
+
+    def offset_page(self, number):
+        """Совместимость со ссылками ?page=N в пределах ограничения."""
+        number = min(max(number, 1), settings.PAGINATOR_MAX_OFFSET_PAGE)
+        rows = self._offset_rows(number)
+        if not rows and number > 1:
+            # Как у Paginator: ссылка за конец ведёт на последнюю страницу.
+            # count может быть оценкой, поэтому в крайнем случае — первая.
+            number = max(min(ceil(self.count / self.per_page), number - 1), 1)
+            rows = self._offset_rows(number)
+            if not rows and number > 1:
+                number, rows = 1, self._offset_rows(1)
+        has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[:self.per_page], number, has_next, number > 1
+        )
+
+    def page_from_request(self, request):
+        cursor = request.GET.get('cursor')
+        if cursor:
+            return self.cursor_page(cursor)
+        try:
+            page_number = int(request.GET.get('page', 1))
+        except ValueError:
+            page_number = 1
+        return self.offset_page(page_number)
 
 
-def paginator_page(request, data):
-    paginator = Paginator(data, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def paginator_page(request, data, ordering=POSTS_ORDERING, count=None):
+    paginator = CursorPaginator(
+        data, settings.POSTS_PER_PAGE, ordering, count
+    )
+    return paginator.page_from_request(request)
@@ -0,0 +1,254 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from .counters import get_object_counts
+from .models import Comment, Counter, Group, Post, User
+from .views import COMMENTS_ORDERING, post_validators
+from core.cache import listing_validators
+from core.conditional import conditional_page
+from core.utils import CursorPaginator
+
+COMMENT_COLUMNS = ('id', 'text', 'created', 'author__username')
+# Столбцы ключа курсора выбираются всегда.
+CURSOR_COLUMNS = ('id', 'pub_date')
+
+
+def _image(request, row):
+    if not row['image']:
+        return None
+    storage = Post._meta.get_field('image').storage
+    return {
+        'url': request.build_absolute_uri(storage.url(row['image'])),
+        'width': row['image_width'],
+        'height': row['image_height'],
+        'color': row['image_color'] or None,
+    }
+
+
+def _group(request, row):
+    if not row['group__slug']:
+        return None
+    return {'slug': row['group__slug'], 'title': row['group__title']}
+
+
+# Поле ответа: (столбцы values(), функция (request, строка) → значение).
+POST_FIELDS = {
+    'id': (('id',), lambda request, row: row['id']),
+    'text': (('text',), lambda request, row: row['text']),
+    'pub_date': (
+        ('pub_date',), lambda request, row: row['pub_date'].isoformat()
+    ),
+    'updated': (('updated',), lambda request, row: row['updated'].isoformat()),
+    'author': (
+        ('author__username',), lambda request, row: row['author__username']
+    ),
+    'group': (('group__slug', 'group__title'), _group),
+    'image': (('image', 'image_width', 'image_height', 'image_color'), _image),
+    'comments_count': (
+        ('comments_count',), lambda request, row: row['comments_count'] or 0
+    ),
+}
+
+
+class FieldsError(ValueError):
+    """В ?fields= есть неизвестные поля."""
+
+
+def selected_fields(request):
+    """Поля поста из ?fields=a,b,c; по умолчанию — все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(POST_FIELDS)
+    fields = list(dict.fromkeys(
+        name.strip() for name in raw.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown or not fields:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(POST_FIELDS)}'
+        )
+    return fields
+
+
+def post_rows(queryset, fields):
+    """Строки values() только со столбцами выбранных полей.
+
+    Автор и группа приходят JOIN из того же запроса, число
+    комментариев — подзапросом к счётчикам.
+    """
+    columns = dict.fromkeys(CURSOR_COLUMNS)
+    for name in fields:
+        columns.update(dict.fromkeys(POST_FIELDS[name][0]))
+    if 'comments_count' in fields:
+        queryset = queryset.annotate(comments_count=Subquery(
+            Counter.objects.filter(
+                kind=Counter.POST_COMMENTS, object_id=OuterRef('pk')
+            ).values('value')
+        ))
+    return queryset.values(*columns)
+
+
+def serialize_post(request, row, fields):
+    return {name: POST_FIELDS[name][1](request, row) for name in fields}
+
+
+def serialize_comment(request, row):
+    return {
+        'id': row['id'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'created': row['created'].isoformat(),
+    }
+
+
+def _page_url(request, cursor, path=None):
+    if not cursor:
+        return None
+    query = request.GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return request.build_absolute_uri(
+        f'{path or request.path}?{query.urlencode()}'
+    )
+
+
+def page_payload(request, page, serialize, path=None):
+    return {
+        'results': [serialize(request, row) for row in page],
+        'next': _page_url(request, page.next_cursor, path),
+        'previous': _page_url(request, page.previous_cursor, path),
+    }
+
+
+def error(message, status):
+    return JsonResponse(
+        {'error': message}, status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def respond(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def posts_payload(request, queryset, count=None):
+    fields = selected_fields(request)
+    paginator = CursorPaginator(
+        post_rows(queryset, fields), settings.POSTS_PER_PAGE, count=count
+    )
+    return page_payload(
+        request, paginator.page_from_request(request),
+        lambda request, row: serialize_post(request, row, fields),
+    )
+
+
+def comments_payload(request, post_id):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_COLUMNS),
+        settings.COMMENTS_PER_PAGE,
+        COMMENTS_ORDERING,
+    )
+    return page_payload(
+        request, paginator.page_from_request(request), serialize_comment,
+        path=reverse('posts:api_comments', args=(post_id,)),
+    )
+
+
+def api_view(validators):
+    """GET-представление API с условными ответами и ошибками в JSON."""
+    def decorator(view):
+        @require_safe
+        @conditional_page(validators)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except FieldsError as exception:
+                return error(str(exception), 400)
+        return wrapper
+    return decorator
+
+
+def listing(namespace, scope_kwarg=None):
+    def validators(request, **kwargs):
+        scope = kwargs.get(scope_kwarg) if scope_kwarg else None
+        return listing_validators(namespace, scope)
+    return validators
+
+
+@api_view(listing('index'))
+def post_list(request):
+    """Лента всех постов."""
+    return respond(posts_payload(request, Post.objects.all()))
+
+
+@api_view(listing('group', 'slug'))
+def group_detail(request, slug):
+    """Группа и её посты."""
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'slug', 'title', 'description'
+    ).first()
+    if group is None:
+        return error('Группа не найдена', 404)
+    counts = get_object_counts((Counter.GROUP_POSTS,), group['id'])
+    group['posts_count'] = counts[Counter.GROUP_POSTS]
+    return respond({
+        'group': group,
+        **posts_payload(
+            request, Post.objects.filter(group_id=group['id']),
+            count=group['posts_count'],
+        ),
+    })
+
+
+@api_view(listing('profile', 'username'))
+def profile_detail(request, username):
+    """Профиль автора и его посты."""
+    author = User.objects.filter(username=username).values(
+        'id', 'username', 'first_name', 'last_name'
+    ).first()
+    if author is None:
+        return error('Автор не найден', 404)
+    counts = get_object_counts(
+        (Counter.AUTHOR_POSTS, Counter.FOLLOWERS, Counter.FOLLOWING),
+        author['id'],
+    )
+    author.update(
+        posts_count=counts[Counter.AUTHOR_POSTS],
+        followers_count=counts[Counter.FOLLOWERS],
+        following_count=counts[Counter.FOLLOWING],
+    )
+    return respond({
+        'profile': author,
+        **posts_payload(
+            request, Post.objects.filter(author_id=author['id']),
+            count=author['posts_count'],
+        ),
+    })
+
+
+@api_view(post_validators)
+def post_detail(request, post_id):
+    """Пост и первая страница комментариев."""
+    fields = selected_fields(request)
+    row = post_rows(Post.objects.filter(pk=post_id), fields).first()
+    if row is None:
+        return error('Пост не найден', 404)
+    return respond({
+        'post': serialize_post(request, row, fields),
+        'comments': comments_payload(request, post_id),
+    })
+
+
+@api_view(post_validators)
+def comment_list(request, post_id):
+    """Страница комментариев поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден', 404)
+    return respond(comments_payload(request, post_id))
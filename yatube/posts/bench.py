@@ -0,0 +1,153 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+# Метрики, по которым результаты сравниваются с эталоном.
+COMPARED = ('p50_ms', 'p90_ms', 'queries')
+
+
+def percentile(values, share):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings, queries, db_times, errors):
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': round(sum(queries) / len(queries), 2),
+        'db_ms': round(sum(db_times) / len(db_times), 3),
+    }
+
+
+class QueryTimer:
+    """Считает запросы и точное время в базе через execute_wrapper.
+
+    connection.queries округляет время до миллисекунд, для быстрых
+    запросов SQLite этого мало.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _targets(rng):
+    """Функции, выдающие (метод, адрес, данные) очередного запроса."""
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    usernames = list(User.objects.values_list('username', flat=True))
+    slugs = list(Group.objects.values_list('slug', flat=True))
+
+    def page():
+        return {'page': rng.randint(1, 5)}
+
+    return {
+        'index': lambda: ('get', reverse('posts:index'), page()),
+        'group_posts': lambda: (
+            'get',
+            reverse('posts:group_list', args=(rng.choice(slugs),)),
+            page(),
+        ),
+        'profile': lambda: (
+            'get',
+            reverse('posts:profile', args=(rng.choice(usernames),)),
+            page(),
+        ),
+        'post_detail': lambda: (
+            'get',
+            reverse('posts:post_detail', args=(rng.choice(post_ids),)),
+            {},
+        ),
+        'follow_index': lambda: (
+            'get', reverse('posts:follow_index'), page()
+        ),
+        'post_create': lambda: (
+            'post', reverse('posts:post_create'), {'text': 'Замер'}
+        ),
+        'add_comment': lambda: (
+            'post',
+            reverse('posts:add_comment', args=(rng.choice(post_ids),)),
+            {'text': 'Замер'},
+        ),
+    }
+
+
+def run(requests=50, warm=False, seed=0, scenarios=SCENARIOS):
+    """Прогоняет представления через тестовый клиент.
+
+    Запросы идут от пользователя с наибольшим числом подписок.
+    Без warm кеш очищается перед каждым запросом, так что замер
+    показывает путь до базы.
+    """
+    rng = random.Random(seed)
+    reader = User.objects.annotate(
+        follows=Count('follower')
+    ).order_by('-follows', 'pk').first()
+    client = Client()
+    client.force_login(reader)
+    targets = _targets(rng)
+    results = {}
+    for name in scenarios:
+        timings, queries, db_times, errors = [], [], [], 0
+        for _ in range(requests):
+            method, url, data = targets[name]()
+            if not warm:
+                cache.clear()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                errors += 1
+            timings.append(elapsed * 1000)
+            queries.append(timer.count)
+            db_times.append(timer.seconds * 1000)
+        results[name] = summarize(timings, queries, db_times, errors)
+    return results
+
+
+def compare(results, baseline, threshold=10.0):
+    """Сравнивает замеры с эталоном.
+
+    Возвращает строки (представление, метрика, было, стало, изменение
+    в процентах, регрессия ли это). Регрессия — рост метрики больше
+    чем на threshold процентов.
+    """
+    rows = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get(name)
+        if not old_metrics:
+            continue
+        for metric in COMPARED:
+            old, new = old_metrics.get(metric), metrics[metric]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            rows.append((name, metric, old, new, change, change > threshold))
+    return rows
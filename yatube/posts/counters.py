@@ -0,0 +1,126 @@
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+
+from .models import Counter
+
+
+def increment(kind, object_id, delta=1):
+    """Атомарно изменяет счётчик, создавая его при необходимости."""
+    counters = Counter.objects.filter(kind=kind, object_id=object_id)
+    if counters.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            Counter.objects.create(kind=kind, object_id=object_id, value=delta)
+    except IntegrityError:
+        counters.update(value=F('value') + delta)
+
+
+def get_counts(kind, object_ids):
+    counts = dict.fromkeys(object_ids, 0)
+    counts.update(
+        Counter.objects.filter(kind=kind, object_id__in=object_ids)
+        .values_list('object_id', 'value')
+    )
+    return counts
+
+
+def get_count(kind, object_id):
+    return get_counts(kind, [object_id])[object_id]
+
+
+def get_object_counts(kinds, object_id):
+    """Несколько счётчиков одного объекта одним запросом."""
+    counts = dict.fromkeys(kinds, 0)
+    counts.update(
+        Counter.objects.filter(kind__in=kinds, object_id=object_id)
+        .values_list('kind', 'value')
+    )
+    return counts
+
+
+def delete_counters(kinds, object_id):
+    Counter.objects.filter(kind__in=kinds, object_id=object_id).delete()
+
+
+def _sources(apps):
+    """Выборка и поле, по которым считается каждый вид счётчика."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    return {
+        Counter.AUTHOR_POSTS: (Post.objects.all(), 'author_id'),
+        Counter.GROUP_POSTS: (Post.objects.exclude(group=None), 'group_id'),
+        Counter.FOLLOWERS: (Follow.objects.all(), 'author_id'),
+        Counter.FOLLOWING: (Follow.objects.all(), 'user_id'),
+        Counter.POST_COMMENTS: (Comment.objects.all(), 'post_id'),
+    }
+
+
+def _next_id(counters, queryset, field, start):
+    """Наименьший id не меньше start в данных или в счётчиках."""
+    found = [
+        queryset.filter(**{f'{field}__gte': start}).aggregate(
+            low=Min(field)
+        )['low'],
+        counters.filter(object_id__gte=start).aggregate(
+            low=Min('object_id')
+        )['low'],
+    ]
+    found = [value for value in found if value is not None]
+    return min(found) if found else None
+
+
+def _reconcile_range(counters, kind, queryset, field, low, high):
+    """Исправляет счётчики объектов с id в [low, high)."""
+    CounterModel = counters.model
+    actual = dict(
+        queryset.filter(**{f'{field}__gte': low, f'{field}__lt': high})
+        .order_by().values_list(field).annotate(total=Count('pk'))
+    )
+    stored = dict(
+        counters.filter(object_id__gte=low, object_id__lt=high)
+        .values_list('object_id', 'value')
+    )
+    stale = [
+        object_id for object_id, value in stored.items()
+        if object_id not in actual and value != 0
+    ]
+    counters.filter(object_id__in=stale).delete()
+    repaired = len(stale)
+    missing = []
+    for object_id, value in actual.items():
+        if object_id not in stored:
+            missing.append(CounterModel(
+                kind=kind, object_id=object_id, value=value
+            ))
+        elif stored[object_id] != value:
+            counters.filter(object_id=object_id).update(value=value)
+            repaired += 1
+    # Пачки по предельному для бэкенда размеру: явный batch_size
+    # Django 2.2 не ограничивает лимитом SQLite.
+    CounterModel.objects.bulk_create(missing)
+    return repaired + len(missing)
+
+
+def reconcile(apps=django_apps, batch_size=5000):
+    """Пересчитывает счётчики по данным и исправляет расхождения.
+
+    Объекты обходятся диапазонами из batch_size id, каждый в своей
+    транзакции, так что память не растёт с объёмом данных.
+    Возвращает число исправленных счётчиков.
+    """
+    CounterModel = apps.get_model('posts', 'Counter')
+    repaired = 0
+    for kind, (queryset, field) in _sources(apps).items():
+        counters = CounterModel.objects.filter(kind=kind)
+        low = _next_id(counters, queryset, field, 0)
+        while low is not None:
+            high = low + batch_size
+            with transaction.atomic():
+                repaired += _reconcile_range(
+                    counters, kind, queryset, field, low, high
+                )
+            low = _next_id(counters, queryset, field, high)
+    return repaired
@@ -0,0 +1,254 @@
+import datetime
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+
+from .media import invalidate_pages
+from .models import Comment, Follow, Group, Post, StoredFile
+from .seed import manual_dates, rebuild
+
+# Порядок важен: при загрузке строки ссылаются на уже загруженные.
+MODELS = (Group, Post, Comment, Follow, StoredFile)
+MANIFEST = 'manifest.json'
+STATE = 'restore-state.json'
+FORMAT_VERSION = 1
+
+
+class DumpError(Exception):
+    """Дамп неполон или не подходит к текущей схеме."""
+
+
+def _default(value):
+    # DjangoJSONEncoder отбрасывает микросекунды, а по ним
+    # различаются посты на курсорной пагинации.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется')
+
+
+def _attnames(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _write_json(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump(data, output, ensure_ascii=False, indent=2)
+    os.replace(temporary, path)
+
+
+def dump(directory, chunk_size=2000, part_size=100000, progress=None):
+    """Выгружает группы, посты, комментарии и подписки в directory.
+
+    Каждая модель пишется частями по part_size строк в сжатый NDJSON:
+    одна строка файла — JSON-массив значений полей в порядке из
+    манифеста. Строки читаются .iterator(chunk_size) по возрастанию
+    pk, так что память не зависит от объёма. Манифест пишется
+    последним: без него дамп считается незавершённым.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        # Прерванная перезапись не должна выглядеть готовым дампом.
+        os.remove(manifest_path)
+    manifest = {'version': FORMAT_VERSION, 'models': []}
+    with transaction.atomic():
+        for model in MODELS:
+            manifest['models'].append(
+                _dump_model(model, directory, chunk_size, part_size, progress)
+            )
+    _write_json(manifest_path, manifest)
+    return manifest
+
+
+def _dump_model(model, directory, chunk_size, part_size, progress):
+    fields = _attnames(model)
+    rows = model.objects.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+    parts = []
+    while True:
+        batch = islice(rows, part_size)
+        name = f'{model._meta.label_lower}-{len(parts):05d}.ndjson.gz'
+        path = os.path.join(directory, name)
+        count = 0
+        with gzip.open(path, 'wt', encoding='utf-8') as output:
+            for row in batch:
+                output.write(json.dumps(
+                    row, ensure_ascii=False, default=_default
+                ))
+                output.write('\n')
+                count += 1
+        if not count:
+            os.remove(path)
+            break
+        parts.append({'file': name, 'rows': count})
+        if progress:
+            progress(model._meta.label, name, count)
+    return {
+        'model': model._meta.label_lower,
+        'fields': fields,
+        'parts': parts,
+    }
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise DumpError(f'В {directory} нет {MANIFEST}: дамп не завершён')
+    with open(path) as source:
+        manifest = json.load(source)
+    if manifest.get('version') != FORMAT_VERSION:
+        raise DumpError('Неизвестная версия формата дампа')
+    models = {model._meta.label_lower: model for model in MODELS}
+    for entry in manifest['models']:
+        model = models.get(entry['model'])
+        if model is None:
+            raise DumpError(f'Неизвестная модель {entry["model"]}')
+        missing = set(entry['fields']) - set(_attnames(model))
+        if missing:
+            raise DumpError(
+                f'{entry["model"]}: в схеме нет полей {sorted(missing)}'
+            )
+        entry['model'] = model
+    return manifest
+
+
+def _index_names(model):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return {
+        name for name, info in constraints.items()
+        if info['index'] and not info['unique'] and not info['primary_key']
+    }
+
+
+def drop_indexes(models):
+    """Удаляет вторичные индексы из Meta.indexes на время загрузки.
+
+    Уникальные ограничения остаются: на них держится целостность
+    и пропуск уже загруженных строк.
+    """
+    with connection.schema_editor() as editor:
+        for model in models:
+            existing = _index_names(model)
+            for index in model._meta.indexes:
+                if index.name in existing:
+                    editor.remove_index(model, index)
+
+
+def create_indexes(models):
+    """Создаёт недостающие индексы из Meta.indexes."""
+    with connection.schema_editor() as editor:
+        for model in models:
+            existing = _index_names(model)
+            for index in model._meta.indexes:
+                if index.name not in existing:
+                    editor.add_index(model, index)
+
+
+class Restore:
+    """Загрузка дампа частями с отметками о готовых частях.
+
+    Готовые части перечислены в файле состояния: после сбоя
+    повторный запуск пропускает их, а строки частично записанной
+    части, если она успела зафиксироваться, пропускаются по pk
+    (ignore_conflicts).
+    """
+
+    def __init__(self, directory, state_path=None, workers=4,
+                 chunk_size=2000, progress=None):
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.state_path = state_path or os.path.join(directory, STATE)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as source:
+                self.done = set(json.load(source)['done'])
+
+    def mark_done(self, name):
+        with self.lock:
+            self.done.add(name)
+            _write_json(self.state_path, {'done': sorted(self.done)})
+
+    def rows(self, entry, part):
+        model, fields = entry['model'], entry['fields']
+        path = os.path.join(self.directory, part['file'])
+        with gzip.open(path, 'rt', encoding='utf-8') as source:
+            for line in source:
+                yield model(**dict(zip(fields, json.loads(line))))
+
+    def load_part(self, entry, part):
+        model = entry['model']
+        try:
+            loaded = 0
+            rows = self.rows(entry, part)
+            with transaction.atomic():
+                while True:
+                    batch = list(islice(rows, self.chunk_size))
+                    if not batch:
+                        break
+                    model.objects.bulk_create(batch, ignore_conflicts=True)
+                    loaded += len(batch)
+            self.mark_done(part['file'])
+            if self.progress:
+                self.progress(model._meta.label, part['file'], loaded)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    def load(self, entry):
+        parts = [
+            part for part in entry['parts'] if part['file'] not in self.done
+        ]
+        # SQLite пишет одним писателем: параллельные транзакции
+        # только ждали бы блокировку.
+        workers = 1 if connection.vendor == 'sqlite' else self.workers
+        if workers <= 1:
+            for part in parts:
+                self.load_part(entry, part)
+            return
+        with ThreadPoolExecutor(workers) as executor:
+            for future in [
+                executor.submit(self.load_part, entry, part)
+                for part in parts
+            ]:
+                future.result()
+
+    def run(self):
+        models = [entry['model'] for entry in self.manifest['models']]
+        drop_indexes(models)
+        with manual_dates(*models):
+            for entry in self.manifest['models']:
+                self.load(entry)
+        create_indexes(models)
+        self.reset_sequences(models)
+        # Строки загружены в обход сигналов.
+        rebuild()
+        invalidate_pages()
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def reset_sequences(self, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+
+def restore(directory, **options):
+    """Загружает дамп из directory; см. Restore."""
+    Restore(directory, **options).run()
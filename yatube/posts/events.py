@@ -0,0 +1,279 @@
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .models import Follow, Group, PostEvent
+from core.cache import get_versions
+
+Event = namedtuple('Event', 'id author_id group_id data')
+
+
+class HubFull(Exception):
+    """Все соединения потока событий этого процесса заняты."""
+
+
+def fetch(after, limit):
+    """События с id больше after по возрастанию, одним запросом."""
+    rows = PostEvent.objects.filter(id__gt=after).order_by('id').values_list(
+        'id', 'post_id', 'author_id', 'group_id',
+        'author__username', 'group__slug',
+    )[:limit]
+    return [
+        Event(event_id, author_id, group_id, json.dumps({
+            'post': post_id,
+            'author': username,
+            'group': slug,
+            'url': reverse('posts:post_detail', args=(post_id,)),
+        }, ensure_ascii=False))
+        for event_id, post_id, author_id, group_id, username, slug in rows
+    ]
+
+
+class Hub:
+    """Раздача событий о новых постах соединениям одного процесса.
+
+    Таблицу PostEvent опрашивает не чаще раза в EVENTS_POLL_INTERVAL
+    тот из ждущих потоков, кто первым заметил, что пора; остальные
+    ждут на условии и забирают события из общего буфера. Так число
+    запросов не растёт с числом соединений. Пост, созданный в этом
+    же процессе, будит ожидающих сразу после фиксации.
+
+    В SQLite писатель один, поэтому id фиксируются по возрастанию
+    и опрос по id > last_id ничего не пропускает.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._events = deque()
+        # Буфер полон для курсоров не меньше floor.
+        self._floor = None
+        self._last_id = None
+        self._next_poll = 0.0
+        self.connections = 0
+        self.rejected = 0
+
+    def connect(self):
+        with self._lock:
+            if self.connections >= settings.EVENTS_MAX_CONNECTIONS:
+                self.rejected += 1
+                raise HubFull
+            self.connections += 1
+
+    def disconnect(self):
+        with self._lock:
+            self.connections -= 1
+
+    def wake(self):
+        """Опросить таблицу, не дожидаясь интервала."""
+        self._next_poll = 0.0
+        with self._condition:
+            self._condition.notify_all()
+
+    def head(self):
+        """id последнего события: с него начинается новый поток."""
+        self._maybe_poll()
+        with self._lock:
+            return self._last_id or 0
+
+    def poll(self):
+        if self._last_id is None:
+            last_id = PostEvent.objects.aggregate(last=Max('id'))['last']
+            with self._lock:
+                self._last_id = self._floor = last_id or 0
+        events = fetch(self._last_id, settings.EVENTS_BUFFER)
+        self._next_poll = time.monotonic() + settings.EVENTS_POLL_INTERVAL
+        if len(events) == settings.EVENTS_BUFFER:
+            self._next_poll = 0.0
+        if not events:
+            return
+        with self._lock:
+            self._events.extend(events)
+            while len(self._events) > settings.EVENTS_BUFFER:
+                self._floor = self._events.popleft().id
+            self._last_id = events[-1].id
+        with self._condition:
+            self._condition.notify_all()
+
+    def _maybe_poll(self):
+        if time.monotonic() < self._next_poll:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self.poll()
+        finally:
+            self._poll_lock.release()
+
+    def after(self, cursor):
+        """События буфера после cursor; None, если буфер их не покрывает."""
+        with self._lock:
+            if self._floor is None or cursor < self._floor:
+                return None
+            return [event for event in self._events if event.id > cursor]
+
+    def wait(self, cursor, timeout):
+        """События после cursor; пустой список, если за timeout их не было."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self._maybe_poll()
+            events = self.after(cursor)
+            if events is None:
+                # Клиент вернулся после долгого перерыва.
+                events = fetch(cursor, settings.EVENTS_BUFFER)
+                if events:
+                    return events
+                # Между cursor и началом буфера событий нет (удалены
+                # вместе с постами или курсор выдуман): ждём с floor.
+                with self._lock:
+                    if self._floor is not None:
+                        cursor = max(cursor, self._floor)
+            if events:
+                return events
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            with self._condition:
+                self._condition.wait(
+                    min(remaining, settings.EVENTS_POLL_INTERVAL or remaining)
+                )
+
+
+hub = Hub()
+
+
+def publish(post):
+    """Записывает событие о новом посте и удаляет устаревшие."""
+    PostEvent.objects.create(
+        post=post, author_id=post.author_id, group_id=post.group_id
+    )
+    PostEvent.objects.filter(
+        created__lt=timezone.now()
+        - timedelta(seconds=settings.EVENTS_RETENTION)
+    ).delete()
+    transaction.on_commit(hub.wake)
+
+
+class Followed:
+    """Отбор событий авторов, на которых подписан пользователь.
+
+    Подписки перечитываются, когда меняется версия ленты подписок.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.version = None
+        self.authors = set()
+
+    def __call__(self, events):
+        version = get_versions('follow', self.user.username)[-1]
+        if version != self.version:
+            self.version = version
+            self.authors = set(Follow.objects.filter(
+                user=self.user
+            ).values_list('author_id', flat=True))
+        return [event for event in events if event.author_id in self.authors]
+
+
+def in_group(group_id):
+    def select(events):
+        return [event for event in events if event.group_id == group_id]
+    return select
+
+
+def everything(events):
+    return events
+
+
+def last_event_id(request):
+    value = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get(
+        'last_event_id'
+    )
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class EventStream:
+    """Тело ответа text/event-stream с пульсом и ограниченным сроком.
+
+    Место в Hub занимается при создании и освобождается в close(),
+    которую сервер вызывает и для так и не начатого ответа. По
+    истечении EVENTS_STREAM_TIMEOUT поток завершается, и браузер
+    переподключается с Last-Event-ID, не теряя событий.
+    """
+
+    def __init__(self, hub, select, cursor=None):
+        hub.connect()
+        self.hub = hub
+        self.select = select
+        self.closed = False
+        try:
+            self.cursor = hub.head() if cursor is None else cursor
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        yield f'retry: {settings.EVENTS_RETRY}\n\n'
+        deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+        sent = time.monotonic()
+        while time.monotonic() < deadline:
+            events = self.hub.wait(self.cursor, settings.EVENTS_HEARTBEAT)
+            if events:
+                self.cursor = events[-1].id
+            chunk = ''.join(
+                f'id: {event.id}\nevent: post\ndata: {event.data}\n\n'
+                for event in self.select(events)
+            )
+            if not chunk:
+                if time.monotonic() - sent < settings.EVENTS_HEARTBEAT:
+                    continue
+                chunk = ': ping\n\n'
+            sent = time.monotonic()
+            yield chunk
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub.disconnect()
+
+
+@require_GET
+def post_events(request, slug=None, follow=False):
+    """Поток уведомлений о новых постах: все, группы или подписок."""
+    if follow:
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        select = Followed(request.user)
+    elif slug is not None:
+        select = in_group(get_object_or_404(Group, slug=slug).pk)
+    else:
+        select = everything
+    try:
+        stream = EventStream(hub, select, last_event_id(request))
+    except HubFull:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = settings.EVENTS_RETRY // 1000
+        return response
+    response = StreamingHttpResponse(
+        stream, content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Иначе nginx копит ответ в буфере.
+    response['X-Accel-Buffering'] = 'no'
+    return response
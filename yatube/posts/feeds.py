@@ -0,0 +1,330 @@
+import heapq
+from array import array
+from calendar import timegm
+from itertools import chain, islice, takewhile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry
+from core.utils import CursorPaginator, paginator_page
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+AUTHOR_POSTS_KEY = 'feed:author:{}'
+
+
+def timeline(user):
+    """Лента подписок пользователя из материализованной таблицы."""
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def _trim_timeline(user_id, limit):
+    """Удаляет записи ленты дальше limit; возвращает их число."""
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    cutoff = entries.order_by(*TIMELINE_ORDERING).values_list(
+        'pub_date', 'post_id'
+    )[limit:limit + 1]
+    if not cutoff:
+        return 0
+    pub_date, post_id = cutoff[0]
+    deleted, _ = entries.filter(pub_date__lte=pub_date).exclude(
+        pub_date=pub_date, post_id__gt=post_id
+    ).delete()
+    return deleted
+
+
+def trim_timelines():
+    """Обрезает до TIMELINE_MAX_LENGTH ленты, переросшие её с запасом.
+
+    Запас — TIMELINE_TRIM_SLACK записей. Разнос поста ленты не
+    обрезает: иначе каждый пост стоил бы чтения лент всех подписчиков
+    автора. Задача запускается периодически, трогает только
+    переросшие ленты и удаляет только записи за пределом; каждая
+    лента обрезается в своей транзакции.
+    Возвращает число удалённых записей.
+    """
+    limit = settings.TIMELINE_MAX_LENGTH
+    overgrown = list(
+        TimelineEntry.objects.values('user_id').annotate(
+            entries=Count('id')
+        ).filter(
+            entries__gt=limit + settings.TIMELINE_TRIM_SLACK
+        ).order_by('user_id').values_list('user_id', flat=True)
+    )
+    deleted = 0
+    for user_id in overgrown:
+        with transaction.atomic():
+            deleted += _trim_timeline(user_id, limit)
+    return deleted
+
+
+def fan_out_post(post):
+    """Разносит новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние посты нового автора."""
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in recent
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    _trim_timeline(user_id, settings.TIMELINE_MAX_LENGTH)
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+REBUILD_SQL = """
+    INSERT INTO {timeline} (user_id, post_id, pub_date)
+    SELECT user_id, post_id, pub_date FROM (
+        SELECT follow.user_id, post.id AS post_id, post.pub_date,
+               ROW_NUMBER() OVER (
+                   PARTITION BY follow.user_id
+                   ORDER BY post.pub_date DESC, post.id DESC
+               ) AS position
+        FROM {follow} follow
+        JOIN {post} post ON post.author_id = follow.author_id
+        WHERE follow.user_id BETWEEN %s AND %s
+    ) ranked
+    WHERE position <= %s
+"""
+
+
+def _window_functions():
+    if connection.vendor == 'sqlite':
+        # Django 2.2 не отмечает поддержку у SQLite, хотя она есть с 3.25.
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+    return connection.features.supports_over_clause
+
+
+def rebuild_timelines(batch_size=1000):
+    """Пересобирает все ленты с нуля по таблице подписок.
+
+    Ленты пачки из batch_size подписчиков собираются одним
+    INSERT … SELECT: оконная функция оставляет каждому
+    TIMELINE_MAX_LENGTH последних постов. Без оконных функций
+    ленты дополняются по одной подписке.
+    """
+    TimelineEntry.objects.all().delete()
+    if not _window_functions():
+        follows = Follow.objects.order_by('user_id').values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in follows.iterator():
+            backfill_timeline(user_id, author_id)
+        return
+    sql = REBUILD_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+    )
+    user_ids = Follow.objects.order_by('user_id').values_list(
+        'user_id', flat=True
+    ).distinct()
+    last_id = 0
+    while True:
+        batch = list(user_ids.filter(user_id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [batch[0], batch[-1], settings.TIMELINE_MAX_LENGTH]
+            )
+        last_id = batch[-1]
+
+
+def _timestamp(pub_date):
+    return timegm(pub_date.utctimetuple()) * 10 ** 6 + pub_date.microsecond
+
+
+AUTHOR_POSTS_SQL = """
+    SELECT author_id, pub_date, id FROM (
+        SELECT author_id, pub_date, id, ROW_NUMBER() OVER (
+            PARTITION BY author_id
+            ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM {post}
+        WHERE author_id IN ({authors})
+    ) ranked
+    WHERE position <= %s
+    ORDER BY author_id, pub_date DESC, id DESC
+"""
+
+
+def _window_rows(author_ids, limit):
+    """Строки AUTHOR_POSTS_SQL; pub_date приводится, как это делает ORM."""
+    sql = AUTHOR_POSTS_SQL.format(
+        post=Post._meta.db_table,
+        authors=', '.join(['%s'] * len(author_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*author_ids, limit])
+        rows = cursor.fetchall()
+    column = Post._meta.get_field('pub_date').get_col(Post._meta.db_table)
+    converters = connection.ops.get_db_converters(column)
+    for author_id, pub_date, post_id in rows:
+        for converter in converters:
+            pub_date = converter(pub_date, column, connection)
+        yield author_id, pub_date, post_id
+
+
+def _load_author_posts(author_ids):
+    """Пары (время в мкс, id) последних постов авторов, от новых к старым.
+
+    С оконными функциями списки всех авторов читаются одним
+    запросом, без них — по запросу на автора.
+    """
+    limit = settings.AUTHOR_FEED_LENGTH
+    if _window_functions():
+        rows = _window_rows(author_ids, limit)
+    else:
+        rows = chain.from_iterable(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('author_id', 'pub_date', 'id')[:limit]
+            for author_id in author_ids
+        )
+    lists = {author_id: array('q') for author_id in author_ids}
+    for author_id, pub_date, post_id in rows:
+        lists[author_id].extend((_timestamp(pub_date), post_id))
+    return lists
+
+
+def author_posts(author_ids):
+    """Списки последних постов авторов из кеша, недостающие — из БД."""
+    cache_keys = {AUTHOR_POSTS_KEY.format(pk): pk for pk in author_ids}
+    result = {}
+    for cache_key, raw in cache.get_many(cache_keys).items():
+        keys = array('q')
+        keys.frombytes(raw)
+        result[cache_keys[cache_key]] = keys
+    missing = [pk for pk in cache_keys.values() if pk not in result]
+    if missing:
+        loaded = _load_author_posts(missing)
+        cache.set_many(
+            {
+                AUTHOR_POSTS_KEY.format(pk): keys.tobytes()
+                for pk, keys in loaded.items()
+            },
+            settings.AUTHOR_FEED_TIMEOUT,
+        )
+        result.update(loaded)
+    return result
+
+
+def _update_author_posts(author_id, change):
+    cache_key = AUTHOR_POSTS_KEY.format(author_id)
+    raw = cache.get(cache_key)
+    if raw is None:
+        return
+    keys = array('q')
+    keys.frombytes(raw)
+    keys = change(keys)
+    cache.set(cache_key, keys.tobytes(), settings.AUTHOR_FEED_TIMEOUT)
+
+
+def push_author_post(post):
+    """Добавляет новый пост в начало кешированного списка автора."""
+    def change(keys):
+        keys[:0] = array('q', (_timestamp(post.pub_date), post.id))
+        return keys[:settings.AUTHOR_FEED_LENGTH * 2]
+    _update_author_posts(post.author_id, change)
+
+
+def remove_author_post(post):
+    """Убирает удалённый пост из кешированного списка автора."""
+    def change(keys):
+        pairs = zip(keys[::2], keys[1::2])
+        return array('q', (
+            value for pair in pairs if pair[1] != post.id for value in pair
+        ))
+    _update_author_posts(post.author_id, change)
+
+
+class MergedFeedPaginator(CursorPaginator):
+    """Лента подписок слиянием списков постов авторов (pull-модель)."""
+
+    def __init__(self, user, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page
+        )
+        self.user = user
+
+    @cached_property
+    def _author_lists(self):
+        author_ids = Follow.objects.filter(user=self.user).values_list(
+            'author_id', flat=True
+        )
+        return list(author_posts(list(author_ids)).values())
+
+    @cached_property
+    def count(self):
+        return sum(len(keys) for keys in self._author_lists) // 2
+
+    def _merged_keys(self):
+        streams = [zip(keys[::2], keys[1::2]) for keys in self._author_lists]
+        return heapq.merge(*streams, reverse=True)
+
+    def _fetch(self, key, reverse, offset, limit):
+        merged = self._merged_keys()
+        if key is not None:
+            key = (_timestamp(key[0]), key[1])
+            if reverse:
+                newer = list(takewhile(lambda item: item > key, merged))
+                merged = reversed(newer)
+            else:
+                merged = (item for item in merged if item < key)
+        ids = [
+            post_id for _, post_id in islice(merged, offset, offset + limit)
+        ]
+        posts = self.object_list.in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def follow_feed_page(request):
+    """Страница ленты подписок движком из FOLLOW_FEED_ENGINE."""
+    engine = settings.FOLLOW_FEED_ENGINE
+    if engine == 'timeline':
+        page_obj = paginator_page(
+            request, timeline(request.user), TIMELINE_ORDERING
+        )
+        page_obj.object_list = [entry.post for entry in page_obj]
+        return page_obj
+    if engine == 'merge':
+        paginator = MergedFeedPaginator(
+            request.user, settings.POSTS_PER_PAGE
+        )
+        return paginator.page_from_request(request)
+    return paginator_page(
+        request,
+        Post.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group'),
+    )
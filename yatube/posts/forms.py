@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Post, Comment
+from core.images import check_size
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +9,12 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and hasattr(image, 'content_type'):
+            check_size(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
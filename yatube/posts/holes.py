@@ -0,0 +1,15 @@
+from .models import Follow
+from core.holes import register
+
+
+def follow_button_context(request, author):
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author__username=author
+        ).exists()
+    )
+    return {'author': author, 'following': following}
+
+
+register('follow_button', 'includes/follow_button.html', follow_button_context)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import backfill_image_metadata
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры и заглушки картинок существующих постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Число постов в одном запросе на запись.',
+        )
+
+    def handle(self, *args, **options):
+        done, skipped = backfill_image_metadata(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, пропущено: {skipped}'
+        ))
@@ -0,0 +1,116 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import bench, seed
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет представления постов на тестовой базе со сгенерированными '
+        'данными и сохраняет результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число запросов к каждому представлению.',
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кеш перед запросами.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Сохранить тестовую базу в файле и не наполнять её заново.',
+        )
+        parser.add_argument('--output', default='bench.json')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого замера для сравнения.',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Рост метрики в процентах, считающийся регрессией.',
+        )
+
+    def handle(self, *args, **options):
+        keepdb = options['keepdb']
+        if keepdb and connection.vendor == 'sqlite':
+            connection.settings_dict['TEST'].setdefault(
+                'NAME', os.path.join(settings.BASE_DIR, 'bench.sqlite3')
+            )
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=keepdb
+        )
+        try:
+            results = self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=keepdb
+            )
+            teardown_test_environment()
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+        self.report(results['views'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты сохранены в {options["output"]}'
+        ))
+        if options['baseline']:
+            self.compare(results['views'], options)
+
+    def measure(self, options):
+        sizes = {
+            name: options[name]
+            for name in ('users', 'groups', 'posts', 'follows', 'comments')
+        }
+        if not Post.objects.exists():
+            self.stdout.write('Наполнение базы…')
+            seed.generate(
+                seed=options['seed'], prefix='bench', images=0, **sizes
+            )
+        return {
+            'dataset': sizes,
+            'requests': options['requests'],
+            'warm': options['warm'],
+            'views': bench.run(
+                options['requests'], options['warm'], options['seed']
+            ),
+        }
+
+    def report(self, views):
+        header = ('view', 'p50_ms', 'p90_ms', 'p99_ms', 'queries', 'db_ms')
+        self.stdout.write(''.join(f'{title:>14}' for title in header))
+        for name, metrics in views.items():
+            self.stdout.write(f'{name:>14}' + ''.join(
+                f'{metrics[title]:>14}' for title in header[1:]
+            ))
+
+    def compare(self, views, options):
+        with open(options['baseline']) as baseline:
+            baseline = json.load(baseline)['views']
+        regressions = 0
+        for name, metric, old, new, change, regression in bench.compare(
+            views, baseline, options['threshold']
+        ):
+            line = f'{name} {metric}: {old} → {new} ({change:+.1f}%)'
+            if regression:
+                regressions += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'Регрессий: {regressions}')
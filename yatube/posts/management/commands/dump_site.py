@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts.dump import dump
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в каталог '
+        'сжатыми NDJSON-файлами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Число строк, читаемых из базы за раз.',
+        )
+        parser.add_argument(
+            '--part-size', type=int, default=100000,
+            help='Число строк в одном файле дампа.',
+        )
+
+    def handle(self, *args, **options):
+        manifest = dump(
+            options['directory'],
+            chunk_size=options['chunk_size'],
+            part_size=options['part_size'],
+            progress=self.progress,
+        )
+        total = sum(
+            part['rows']
+            for entry in manifest['models'] for part in entry['parts']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Выгружено строк: {total}'))
+
+    def progress(self, label, name, rows):
+        self.stdout.write(f'{label}: {name} — {rows} строк')
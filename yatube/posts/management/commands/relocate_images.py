@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import relocate_images
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище с адресацией по хешу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Число постов в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        total = relocate_images(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {total}'
+        ))
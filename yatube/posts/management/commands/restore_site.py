@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dump import DumpError, restore
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает дамп dump_site. Пользователи, на которых ссылаются '
+        'строки, должны уже быть в базе. Прерванную загрузку можно '
+        'запустить заново: готовые части пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число частей, загружаемых одновременно (кроме SQLite).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Число строк в одной вставке.',
+        )
+        parser.add_argument(
+            '--state', help='Файл с отметками о загруженных частях.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            restore(
+                options['directory'],
+                state_path=options['state'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                progress=self.progress,
+            )
+        except DumpError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS('Дамп загружен'))
+
+    def progress(self, label, name, rows):
+        self.stdout.write(f'{label}: {name} — {rows} строк')
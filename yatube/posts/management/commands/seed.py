@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, группами, постами, подписками '
+        'и комментариями для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=2000000)
+        parser.add_argument('--comments', type=int, default=3000000)
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить посты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Начало имён пользователей и адресов групп.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Число строк в одной вставке и транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1:
+            raise CommandError('Нужны хотя бы один пользователь и один день.')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('Доля картинок — число от 0 до 1.')
+        try:
+            seed.generate(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                follows=options['follows'],
+                comments=options['comments'],
+                images=options['images'],
+                days=options['days'],
+                seed=options['seed'],
+                prefix=options['prefix'],
+                chunk_size=options['chunk_size'],
+                progress=self.progress,
+            )
+        except RuntimeError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS('База наполнена'))
+
+    def progress(self, title, rows, seconds):
+        if rows is None:
+            self.stdout.write(f'{title}: пересобрано за {seconds:.1f} с')
+        else:
+            self.stdout.write(f'{title}: {rows} строк за {seconds:.1f} с')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Обрезает переросшие ленты подписок до TIMELINE_MAX_LENGTH.'
+
+    def handle(self, *args, **options):
+        deleted = trim_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей из лент: {deleted}'
+        ))
@@ -0,0 +1,120 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from PIL import Image
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import Post, StoredFile
+from core.cache import bump_version
+from core.images import describe
+from core.storage import is_hashed
+
+
+def acquire(name):
+    """Добавляет ссылку на файл хранилища."""
+    files = StoredFile.objects.filter(name=name)
+    if files.update(references=F('references') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(name=name, references=1)
+    except IntegrityError:
+        files.update(references=F('references') + 1)
+
+
+def _delete_unreferenced(name):
+    if StoredFile.objects.filter(name=name).exists():
+        # Пока ждали фиксации, файл загрузили снова.
+        return
+    field = Post._meta.get_field('image')
+    delete_thumbnails(field.attr_class(None, field, name))
+
+
+def release(name):
+    """Убирает ссылку; файл без ссылок удаляется вместе с миниатюрами."""
+    if not is_hashed(name):
+        # Файлы старой раскладки никогда не учитывались.
+        return
+    files = StoredFile.objects.filter(name=name)
+    files.update(references=F('references') - 1)
+    if files.filter(references=0).delete()[0]:
+        transaction.on_commit(lambda: _delete_unreferenced(name))
+
+
+def invalidate_pages():
+    """Сбрасывает кеш всех страниц со списками постов и карточек."""
+    for namespace in ('index', 'follow', 'group', 'profile'):
+        bump_version(namespace)
+
+
+def relocate_images(batch_size=100):
+    """Переносит картинки старой раскладки в HashedStorage.
+
+    Посты обходятся пачками по первичному ключу; каждая пачка
+    переписывает Post.image в своей транзакции. Старый файл и его
+    миниатюры удаляются, когда на него не остаётся постов.
+    Возвращает число перенесённых постов.
+    """
+    storage = Post._meta.get_field('image').storage
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_pk).exclude(image='')
+            .exclude(image=None).order_by('pk')
+            .values_list('pk', 'image')[:batch_size]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        moved = {}
+        with transaction.atomic():
+            for pk, name in batch:
+                if is_hashed(name) or not storage.exists(name):
+                    continue
+                if name not in moved:
+                    with storage.open(name) as content:
+                        moved[name] = storage.save(name, content)
+                acquire(moved[name])
+                Post.objects.filter(pk=pk).update(image=moved[name])
+                total += 1
+        for name in moved:
+            if not Post.objects.filter(image=name).exists():
+                _delete_unreferenced(name)
+    invalidate_pages()
+    return total
+
+
+def backfill_image_metadata(batch_size=100):
+    """Заполняет размеры, цвет и заглушку картинок старых постов.
+
+    Возвращает (обработано, пропущено): файлы, которых нет или
+    которые не читаются, пропускаются.
+    """
+    fields = ['image_width', 'image_height', 'image_color',
+              'image_placeholder']
+    done = skipped = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_pk, image_width=None)
+            .exclude(image='').exclude(image=None).order_by('pk')
+            .only('pk', 'image')[:batch_size]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        described = []
+        for post in batch:
+            try:
+                with post.image.open() as content:
+                    post.set_image_metadata(describe(content))
+            except (OSError, Image.DecompressionBombError):
+                skipped += 1
+                continue
+            described.append(post)
+        Post.objects.bulk_update(described, fields)
+        done += len(described)
+    if done:
+        invalidate_pages()
+    return done, skipped
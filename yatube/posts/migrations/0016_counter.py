@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:43
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    from posts.counters import reconcile
+    reconcile(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('author_posts', 'Постов автора'), ('group_posts', 'Постов в группе'), ('followers', 'Подписчиков'), ('following', 'Подписок'), ('post_comments', 'Комментариев к посту')], max_length=20, verbose_name='Счётчик')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объект')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик',
+                'verbose_name_plural': 'Счётчики',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='counter',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique counter'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
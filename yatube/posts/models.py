@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.images import describe, ingest
+from core.storage import HashedStorage
+
 User = get_user_model()
 
 
@@ -14,6 +17,7 @@ class Post(models.Model):
         auto_now_add=True,
         help_text='Дата публикации поста'
     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -33,18 +37,69 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=HashedStorage(),
         blank=True,
         null=True
     )
+    # Заполняются при загрузке, чтобы страницы не открывали файл.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', blank=True, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', blank=True, null=True, editable=False
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки', max_length=7, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = "Публикация"
         verbose_name_plural = "Публикации"
+        # SQLite дописывает в индекс rowid по возрастанию, поэтому
+        # возрастающий индекс, прочитанный с конца, отдаёт порядок
+        # (-pub_date, -id) без сортировки во временном B-дереве.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.text[:15]}'
 
+    def save(self, *args, **kwargs):
+        # Новый файл уменьшается и очищается от EXIF до записи на диск.
+        if self.image and not self.image._committed:
+            content = ingest(self.image)
+            self.set_image_metadata(describe(content))
+            self.image = content
+        elif not self.image:
+            self.set_image_metadata(
+                {'width': None, 'height': None, 'color': '', 'placeholder': ''}
+            )
+        super().save(*args, **kwargs)
+
+    def set_image_metadata(self, metadata):
+        for name, value in metadata.items():
+            setattr(self, f'image_{name}', value)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа до правки нужна, чтобы сбросить кеш обеих групп.
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        # По старому имени картинки видно, что загружена новая.
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -82,9 +137,14 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -103,9 +163,130 @@ class Follow(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='unique follow'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline entry'
+            )
+        ]
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик вместо COUNT(*) при каждом запросе."""
+    AUTHOR_POSTS = 'author_posts'
+    GROUP_POSTS = 'group_posts'
+    FOLLOWERS = 'followers'
+    FOLLOWING = 'following'
+    POST_COMMENTS = 'post_comments'
+    KINDS = (
+        (AUTHOR_POSTS, 'Постов автора'),
+        (GROUP_POSTS, 'Постов в группе'),
+        (FOLLOWERS, 'Подписчиков'),
+        (FOLLOWING, 'Подписок'),
+        (POST_COMMENTS, 'Комментариев к посту'),
+    )
+    kind = models.CharField('Счётчик', max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField('Объект')
+    value = models.IntegerField('Значение', default=0)
+
+    class Meta:
+        verbose_name = "Счётчик"
+        verbose_name_plural = "Счётчики"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique counter'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}={self.value}'
+
+
+class StoredFile(models.Model):
+    """Число постов, ссылающихся на файл в HashedStorage.
+
+    Одинаковые картинки хранятся одним файлом; он удаляется, когда
+    на него не остаётся ссылок.
+    """
+    name = models.CharField('Файл', max_length=100, unique=True)
+    references = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+
+    def __str__(self):
+        return f'{self.name}×{self.references}'
+
+
+class PostEvent(models.Model):
+    """Уведомление о новом посте для потоков событий.
+
+    Таблица общая для всех процессов: каждый читает строки по
+    возрастанию id и раздаёт их своим открытым соединениям.
+    Автор и группа повторены здесь, чтобы отбирать события без JOIN.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    created = models.DateTimeField('Дата события', auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Событие"
+        verbose_name_plural = "События"
+        indexes = [
+            models.Index(fields=['created'], name='post_event_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.pk}:{self.post_id}'
@@ -0,0 +1,125 @@
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from core.utils import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос пользователя как набор фраз FTS5, связанных через AND."""
+    terms = query.replace('"', ' ').split()
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def index_posts(rows):
+    """Добавляет или обновляет пары (id, text) в поисковом индексе."""
+    rows = list(rows)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(post_id,) for post_id, _ in rows],
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)', rows
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index(batch_size=1000):
+    """Пересобирает индекс пачками, возвращает число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', 'text')[:batch_size]
+        )
+        if not batch:
+            return total
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                batch,
+            )
+        total += len(batch)
+        last_id = batch[-1][0]
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для .filter()."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по релевантности bm25 с курсорами (rank, id)."""
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ('rank', 'id'),
+        )
+        self.match = match_expression(query)
+
+    def _key_values(self, obj):
+        return [obj.search_rank, obj.pk]
+
+    def _parse_key(self, values):
+        rank, post_id = values
+        return self._check_range([float(rank), int(post_id)])
+
+    @property
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def _fetch(self, key, reverse, offset, limit):
+        if not self.match:
+            return []
+        sql = [
+            f'SELECT rowid, bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s'
+        ]
+        params = [self.match]
+        sign, direction = ('<', 'DESC') if reverse else ('>', 'ASC')
+        if key is not None:
+            sql.append(
+                f'AND (bm25({FTS_TABLE}) {sign} %s '
+                f'OR (bm25({FTS_TABLE}) = %s AND rowid {sign} %s))'
+            )
+            params += [key[0], key[0], key[1]]
+        sql.append(
+            f'ORDER BY bm25({FTS_TABLE}) {direction}, rowid {direction} '
+            'LIMIT %s OFFSET %s'
+        )
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            ranks = dict(cursor.fetchall())
+        posts = self.object_list.in_bulk(list(ranks))
+        rows = []
+        for post_id, rank in ranks.items():
+            if post_id in posts:
+                posts[post_id].search_rank = rank
+                rows.append(posts[post_id])
+        return rows
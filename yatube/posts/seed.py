@@ -0,0 +1,351 @@
+import io
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from . import counters, feeds, search
+from .models import Comment, Follow, Group, Post, StoredFile, User
+from core.images import describe
+
+# Перекос выбора: индекс = n * random() ** skew, чем больше показатель,
+# тем большая доля достаётся первым пользователям, группам и постам.
+FOLLOW_SKEW = 3.0
+AUTHOR_SKEW = 2.0
+GROUP_SKEW = 1.5
+COMMENT_SKEW = 3.0
+UNGROUPED_SHARE = 0.2
+# Доля постов, написанных во всплесках активности, и их длина.
+BURST_SHARE = 0.7
+BURSTS_PER_DAY = 3
+BURST_SECONDS = 30 * 60
+# Среднее время от поста до комментария.
+COMMENT_DELAY_SECONDS = 6 * 60 * 60
+TEXT_POOL = 500
+IMAGE_POOL = 12
+IMAGE_SIZES = ((1200, 800), (800, 1200), (1600, 900), (1024, 1024))
+MASK = 2 ** 64 - 1
+
+
+@contextmanager
+def manual_dates(*models):
+    """Отключает auto_now и auto_now_add, чтобы задать даты вручную."""
+    fields = [
+        field for model in models for field in model._meta.fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objects, chunk_size):
+    """Вставляет объекты из итератора пачками по транзакции на пачку.
+
+    В памяти держится только текущая пачка. Возвращает число строк.
+    """
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, chunk_size))
+        if not batch:
+            return total
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        # При DEBUG журнал запросов копил бы текст каждой вставки.
+        reset_queries()
+        total += len(batch)
+
+
+def _last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def _first_pk(model, after, expected):
+    """Первый pk строк, вставленных после after.
+
+    Строки дальше адресуются как first + номер, поэтому pk должны
+    идти подряд: наполнять базу параллельно с другими записями нельзя.
+    """
+    bounds = model.objects.filter(pk__gt=after).aggregate(
+        first=Min('pk'), last=Max('pk'), total=Count('pk')
+    )
+    if expected and (
+        bounds['total'] != expected
+        or bounds['last'] - bounds['first'] + 1 != expected
+    ):
+        raise RuntimeError(
+            f'{model._meta.label}: первичные ключи вставленных строк '
+            f'идут не подряд'
+        )
+    return bounds['first']
+
+
+def _mix(value):
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def _units(seed, index, count):
+    """count чисел из [0, 1), зависящих только от seed и index.
+
+    Так время поста вычисляется заново при выборе его комментариев
+    и не хранится в памяти.
+    """
+    state = _mix(seed) ^ index
+    units = []
+    for _ in range(count):
+        state = _mix(state)
+        units.append(state / 2 ** 64)
+    return units
+
+
+def _skewed(rng, size, skew):
+    return int(size * rng.random() ** skew)
+
+
+class Timeline:
+    """Время публикаций: большая часть постов — во всплесках."""
+
+    def __init__(self, rng, seed, now, days):
+        self.seed = seed
+        self.now = now
+        self.span = days * 24 * 60 * 60
+        self.bursts = [
+            rng.uniform(0, self.span)
+            for _ in range(max(1, days * BURSTS_PER_DAY))
+        ]
+
+    def post_time(self, index):
+        share, position, spread = _units(self.seed, index, 3)
+        if share < BURST_SHARE:
+            burst = self.bursts[int(position * len(self.bursts))]
+            seconds = burst - math.log(1 - spread) * BURST_SECONDS
+        else:
+            seconds = position * self.span
+        return self.now - timedelta(seconds=min(seconds, self.span))
+
+    def comment_time(self, rng, post_index):
+        delay = -math.log(1 - rng.random()) * COMMENT_DELAY_SECONDS
+        return min(
+            self.now, self.post_time(post_index) + timedelta(seconds=delay)
+        )
+
+
+def _image_pool(rng, count):
+    """Несколько картинок для постов с их размерами и заглушками.
+
+    Хранилище адресует файлы по содержимому, так что посты просто
+    делят эти файлы, как делили бы одинаковые загрузки.
+    """
+    storage = Post._meta.get_field('image').storage
+    pool = []
+    for _ in range(count):
+        image = Image.new('RGB', rng.choice(IMAGE_SIZES), tuple(
+            rng.randrange(256) for _ in range(3)
+        ))
+        draw = ImageDraw.Draw(image)
+        for _ in range(8):
+            x, y = rng.randrange(image.width), rng.randrange(image.height)
+            radius = rng.randrange(50, 300)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        content = ContentFile(buffer.getvalue())
+        metadata = describe(content)
+        pool.append((storage.save('posts/seed.jpg', content), metadata))
+    return pool
+
+
+def _count_images(pool):
+    """Учитывает ссылки постов на файлы пула, как media.acquire."""
+    used = Post.objects.filter(
+        image__in=[name for name, _ in pool]
+    ).order_by().values_list('image').annotate(total=Count('pk'))
+    for name, references in used:
+        files = StoredFile.objects.filter(name=name)
+        if not files.update(references=F('references') + references):
+            StoredFile.objects.create(name=name, references=references)
+
+
+class Dataset:
+    """Строки всех таблиц, порождаемые генераторами по одной."""
+
+    def __init__(self, users, groups, posts, follows, comments, images,
+                 days, seed, prefix):
+        self.rng = random.Random(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+        self.texts = [
+            self.faker.paragraph(nb_sentences=5) for _ in range(TEXT_POOL)
+        ]
+        self.names = [
+            (self.faker.first_name(), self.faker.last_name())
+            for _ in range(TEXT_POOL)
+        ]
+        self.password = make_password(None)
+        self.now = timezone.now()
+        self.timeline = Timeline(self.rng, seed, self.now, days)
+        self.users, self.groups, self.posts = users, groups, posts
+        self.follows = min(follows, users * (users - 1))
+        self.comments, self.images = comments, images
+        self.days, self.prefix = days, prefix
+        self.pool = []
+        self.first_user = self.first_group = self.first_post = None
+
+    def user_rows(self):
+        for index in range(self.users):
+            first_name, last_name = self.rng.choice(self.names)
+            yield User(
+                username=f'{self.prefix}{index}',
+                first_name=first_name,
+                last_name=last_name,
+                password=self.password,
+                date_joined=self.now - timedelta(
+                    days=self.rng.uniform(self.days, 2 * self.days)
+                ),
+            )
+
+    def group_rows(self):
+        for index in range(self.groups):
+            yield Group(
+                title=self.faker.sentence(nb_words=3)[:200],
+                slug=f'{self.prefix}-group-{index}',
+                description=self.rng.choice(self.texts),
+            )
+
+    def post_rows(self):
+        rng = self.rng
+        for index in range(self.posts):
+            pub_date = self.timeline.post_time(index)
+            post = Post(
+                author_id=self.first_user + _skewed(
+                    rng, self.users, AUTHOR_SKEW
+                ),
+                text=rng.choice(self.texts),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+            if self.groups and rng.random() >= UNGROUPED_SHARE:
+                post.group_id = self.first_group + _skewed(
+                    rng, self.groups, GROUP_SKEW
+                )
+            if self.pool and rng.random() < self.images:
+                name, metadata = rng.choice(self.pool)
+                post.image = name
+                post.set_image_metadata(metadata)
+            yield post
+
+    def followed(self, index, wanted):
+        """wanted разных авторов для подписчика index."""
+        authors = set()
+        attempts = 0
+        while len(authors) < wanted and attempts < 20 * wanted:
+            attempts += 1
+            author = _skewed(self.rng, self.users, FOLLOW_SKEW)
+            if author != index:
+                authors.add(author)
+        # На маленькой базе редкие авторы могут так и не выпасть.
+        spare = (author for author in range(self.users) if author != index)
+        while len(authors) < wanted:
+            authors.add(next(spare))
+        return sorted(authors)
+
+    def follow_rows(self):
+        for index in range(self.users):
+            wanted = (
+                self.follows // self.users
+                + (index < self.follows % self.users)
+            )
+            for author in self.followed(index, wanted):
+                yield Follow(
+                    user_id=self.first_user + index,
+                    author_id=self.first_user + author,
+                )
+
+    def comment_rows(self):
+        rng = self.rng
+        for _ in range(self.comments if self.posts else 0):
+            index = _skewed(rng, self.posts, COMMENT_SKEW)
+            yield Comment(
+                post_id=self.first_post + index,
+                author_id=self.first_user + rng.randrange(self.users),
+                text=rng.choice(self.texts),
+                created=self.timeline.comment_time(rng, index),
+            )
+
+
+def generate(users=1000, groups=20, posts=10000, follows=10000,
+             comments=20000, images=0.1, days=365, seed=0, prefix='seed',
+             chunk_size=5000, progress=None):
+    """Наполняет базу правдоподобными данными для нагрузочных замеров.
+
+    Подписчики распределены по степенному закону, посты пишутся
+    всплесками, доля images постов — с картинками. Строки создаются
+    генераторами и вставляются пачками bulk_create в обход сигналов,
+    поэтому память не растёт с объёмом, а счётчики, ленты и поисковый
+    индекс пересобираются в конце. При одинаковом seed на пустой
+    базе получаются одинаковые данные.
+
+    progress(название, строк, секунд) вызывается после каждого шага.
+    """
+    dataset = Dataset(
+        users, groups, posts, follows, comments, images, days, seed, prefix
+    )
+
+    def step(title, model, objects):
+        started = time.perf_counter()
+        after = _last_pk(model)
+        total = bulk_insert(model, objects, chunk_size)
+        if progress:
+            progress(title, total, time.perf_counter() - started)
+        return _first_pk(model, after, total)
+
+    dataset.first_user = step('users', User, dataset.user_rows())
+    dataset.first_group = step('groups', Group, dataset.group_rows())
+    if images and posts:
+        dataset.pool = _image_pool(dataset.rng, IMAGE_POOL)
+    with manual_dates(Post, Comment):
+        dataset.first_post = step('posts', Post, dataset.post_rows())
+        step('follows', Follow, dataset.follow_rows())
+        step('comments', Comment, dataset.comment_rows())
+    _count_images(dataset.pool)
+    rebuild(progress)
+
+
+def rebuild(progress=None):
+    """Пересобирает производные данные после вставки в обход сигналов."""
+    tasks = [('counters', counters.reconcile)]
+    if settings.FOLLOW_FEED_ENGINE == 'timeline':
+        tasks.append(('timelines', feeds.rebuild_timelines))
+    if search.available():
+        tasks.append(('search', search.rebuild_index))
+    for title, task in tasks:
+        started = time.perf_counter()
+        # Задачи фиксируют работу пачками сами.
+        task()
+        if progress:
+            progress(title, None, time.perf_counter() - started)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
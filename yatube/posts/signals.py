@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import events, feeds, media, search
+from .counters import delete_counters, increment
+from .models import Comment, Counter, Follow, Group, Post, User
+from core import thumbnails
+from core.cache import bump_version
+
+
+def bump_post_listings(post):
+    """Сбрасывает кеш страниц, на которых виден пост."""
+    bump_version('index')
+    bump_version('follow')
+    bump_version('profile', post.author.username)
+    group_ids = {post.group_id, getattr(post, '_loaded_group_id', None)}
+    group_ids.discard(None)
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    for slug in slugs:
+        bump_version('group', slug)
+
+
+def track_group(post, created):
+    """Переносит пост между счётчиками групп при смене группы."""
+    loaded_group_id = None
+    if not created:
+        loaded_group_id = getattr(post, '_loaded_group_id', None)
+    if post.group_id != loaded_group_id:
+        if post.group_id:
+            increment(Counter.GROUP_POSTS, post.group_id)
+        if loaded_group_id:
+            increment(Counter.GROUP_POSTS, loaded_group_id, -1)
+    post._loaded_group_id = post.group_id
+
+
+def track_image(post):
+    """Учитывает ссылки на файлы и нарезает миниатюры новой картинки."""
+    image = post.image
+    loaded_image = getattr(post, '_loaded_image', None)
+    if image.name != loaded_image:
+        if image:
+            media.acquire(image.name)
+            # Иначе первый показ поставил бы картинку в очередь снова.
+            thumbnails.mark_pending([image])
+            # Файл на диске только после фиксации транзакции.
+            transaction.on_commit(lambda: thumbnails.queue.submit(image))
+        if loaded_image:
+            media.release(loaded_image)
+    post._loaded_image = image.name
+
+
+@receiver(thumbnails.thumbnails_ready)
+def thumbnails_ready(sender, image, **kwargs):
+    """Сбрасывает карточки и страницы постов с нарезанной картинкой.
+
+    Пока миниатюр не было, карточки отрисованы без них и закешированы
+    под ключом с updated: сдвиг updated меняет и его, и ETag поста.
+    """
+    posts = Post.objects.filter(image=image.name)
+    posts.update(updated=timezone.now())
+    for post in posts.select_related('author'):
+        bump_post_listings(post)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_listings(instance)
+    if created:
+        increment(Counter.AUTHOR_POSTS, instance.author_id)
+    track_group(instance, created)
+    track_image(instance)
+    if search.available():
+        search.index_posts([(instance.pk, instance.text)])
+    if created:
+        feeds.push_author_post(instance)
+        if settings.FOLLOW_FEED_ENGINE == 'timeline':
+            feeds.fan_out_post(instance)
+        events.publish(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_listings(instance)
+    increment(Counter.AUTHOR_POSTS, instance.author_id, -1)
+    if instance.group_id:
+        increment(Counter.GROUP_POSTS, instance.group_id, -1)
+    delete_counters([Counter.POST_COMMENTS], instance.pk)
+    if search.available():
+        search.unindex_post(instance.pk)
+    if instance.image:
+        media.release(instance.image.name)
+    feeds.remove_author_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_listings(instance.post)
+    if created:
+        increment(Counter.POST_COMMENTS, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_post_listings(instance.post)
+    increment(Counter.POST_COMMENTS, instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version('index')
+        bump_version('follow')
+        bump_version('group')
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    delete_counters([Counter.GROUP_POSTS], instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    delete_counters(
+        [Counter.AUTHOR_POSTS, Counter.FOLLOWERS, Counter.FOLLOWING],
+        instance.pk,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_version('profile', instance.author.username)
+        bump_version('follow', instance.user.username)
+        increment(Counter.FOLLOWERS, instance.author_id)
+        increment(Counter.FOLLOWING, instance.user_id)
+        feeds.backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_version('profile', instance.author.username)
+    bump_version('follow', instance.user.username)
+    increment(Counter.FOLLOWERS, instance.author_id, -1)
+    increment(Counter.FOLLOWING, instance.user_id, -1)
+    feeds.prune_timeline(instance.user_id, instance.author_id)
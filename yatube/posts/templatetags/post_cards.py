@@ -0,0 +1,51 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics, thumbnails
+from core.cache import get_versions
+
+register = template.Library()
+
+CARD_KEY = 'card:{variant}:{post.pk}:{updated}:{group_version}'
+
+
+@register.simple_tag
+def post_cards(posts, variant):
+    """Карточки постов страницы из кеша фрагментов.
+
+    Все карточки запрашиваются одним get_many, отрисовываются только
+    отсутствующие. Ключ меняется при правке поста и любой группы.
+    Миниатюры для отрисовки разрешаются пачкой и кладутся в
+    post.thumbnail и post.srcset.
+    """
+    posts = list(posts)
+    group_version, = get_versions('group')
+    keys = [
+        CARD_KEY.format(
+            variant=variant,
+            post=post,
+            updated=post.updated.timestamp(),
+            group_version=group_version,
+        )
+        for post in posts
+    ]
+    cached = cache.get_many(keys)
+    to_render = [
+        post for key, post in zip(keys, posts) if key not in cached
+    ]
+    metrics.count('card_hit', len(posts) - len(to_render))
+    metrics.count('card_miss', len(to_render))
+    thumbnails.attach(to_render)
+    missing = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        if key not in cached:
+            missing[key] = render_to_string(
+                'includes/article.html', {'post': post, variant: True}
+            )
+        cards.append(mark_safe(cached.get(key, missing.get(key))))
+    cache.set_many(missing, settings.CARD_CACHE_TIMEOUT)
+    return cards
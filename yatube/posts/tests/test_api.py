@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.queries import query_budget
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            for number in range(13)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_list_pages(self):
+        """Список постов отдаётся страницами по курсору."""
+        response = self.client.get(reverse('posts:api_posts'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.post.pk)
+        self.assertEqual(first['author'], 'author')
+        self.assertEqual(
+            first['group'], {'slug': 'group', 'title': 'Группа'}
+        )
+        self.assertEqual(first['comments_count'], 3)
+        self.assertIsNone(first['image'])
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [row['id'] for row in data['results']],
+            [post.pk for post in reversed(self.posts[:3])],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_fields(self):
+        """?fields= оставляет в ответе только выбранные поля."""
+        response = self.client.get(
+            reverse('posts:api_posts'), {'fields': 'id,text'}
+        )
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.post.pk, 'text': self.post.text},
+        )
+        self.assertIn('fields=id%2Ctext', response.json()['next'])
+        response = self.client.get(
+            reverse('posts:api_posts'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_group_and_profile(self):
+        """Группа и профиль отдаются со счётчиками и постами."""
+        data = self.client.get(
+            reverse('posts:api_group', args=(self.group.slug,))
+        ).json()
+        self.assertEqual(data['group']['title'], 'Группа')
+        self.assertEqual(data['group']['posts_count'], 13)
+        self.assertEqual(len(data['results']), 10)
+        data = self.client.get(
+            reverse('posts:api_profile', args=(self.author.username,))
+        ).json()
+        self.assertEqual(data['profile']['posts_count'], 13)
+        self.assertEqual(data['profile']['followers_count'], 0)
+        for url in (
+            reverse('posts:api_group', args=('missing',)),
+            reverse('posts:api_profile', args=('missing',)),
+            reverse('posts:api_post', args=(0,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+
+    def test_post_detail(self):
+        """Пост отдаётся вместе с комментариями."""
+        data = self.client.get(
+            reverse('posts:api_post', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(data['post']['text'], self.post.text)
+        self.assertEqual(
+            [row['text'] for row in data['comments']['results']],
+            [f'Комментарий {number}' for number in (2, 1, 0)],
+        )
+        data = self.client.get(
+            reverse('posts:api_comments', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(len(data['results']), 3)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304, изменение — 200."""
+        url = reverse('posts:api_posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_read_only(self):
+        """API принимает только безопасные методы."""
+        response = self.client.post(reverse('posts:api_posts'))
+        self.assertEqual(response.status_code, 405)
+
+    @query_budget({
+        'posts:api_posts': 2,
+        'posts:api_post': 3,
+    })
+    def test_within_budget(self):
+        """Ответы API укладываются в бюджет запросов без повторов."""
+        self.client.get(reverse('posts:api_posts'))
+        self.client.get(reverse('posts:api_post', args=(self.post.pk,)))
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import bench, seed
+
+
+class BenchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_run_all_scenarios(self):
+        """Замер проходит по всем представлениям без ошибок."""
+        seed.generate(
+            users=4, groups=2, posts=25, follows=6, comments=10, images=0
+        )
+        results = bench.run(requests=3)
+        self.assertEqual(set(results), set(bench.SCENARIOS))
+        for name, metrics in results.items():
+            with self.subTest(view=name):
+                self.assertEqual(metrics['errors'], 0)
+                self.assertEqual(metrics['requests'], 3)
+                self.assertGreater(metrics['queries'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_compare_with_baseline(self):
+        """Рост метрики выше порога отмечается как регрессия."""
+        baseline = {'index': {'p50_ms': 10, 'p90_ms': 20, 'queries': 4}}
+        results = {'index': {'p50_ms': 10.5, 'p90_ms': 30, 'queries': 4}}
+        regressions = [
+            row[1] for row in bench.compare(results, baseline, 10)
+            if row[-1]
+        ]
+        self.assertEqual(regressions, ['p90_ms'])
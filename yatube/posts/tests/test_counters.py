@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..counters import get_count, reconcile
+from ..models import Comment, Counter, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        self.assertEqual(get_count(Counter.AUTHOR_POSTS, self.user.pk), 1)
+        self.assertEqual(get_count(Counter.GROUP_POSTS, self.group.pk), 1)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(get_count(Counter.GROUP_POSTS, self.group.pk), 0)
+        self.assertEqual(
+            get_count(Counter.GROUP_POSTS, self.other_group.pk), 1
+        )
+        post.delete()
+        self.assertEqual(get_count(Counter.AUTHOR_POSTS, self.user.pk), 0)
+        self.assertEqual(
+            get_count(Counter.GROUP_POSTS, self.other_group.pk), 0
+        )
+
+    def test_follow_and_comment_counters(self):
+        """Счётчики подписок и комментариев следуют за записями."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(get_count(Counter.FOLLOWERS, self.user.pk), 1)
+        self.assertEqual(get_count(Counter.FOLLOWING, self.reader.pk), 1)
+        follow.delete()
+        self.assertEqual(get_count(Counter.FOLLOWERS, self.user.pk), 0)
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.assertEqual(get_count(Counter.POST_COMMENTS, post.pk), 1)
+        post.delete()
+        self.assertFalse(
+            Counter.objects.filter(
+                kind=Counter.POST_COMMENTS, object_id=post.pk
+            ).exists()
+        )
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        Counter.objects.filter(kind=Counter.AUTHOR_POSTS).update(value=7)
+        Counter.objects.filter(kind=Counter.GROUP_POSTS).delete()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(get_count(Counter.AUTHOR_POSTS, self.user.pk), 1)
+        self.assertEqual(get_count(Counter.GROUP_POSTS, self.group.pk), 1)
+
+    def test_profile_reads_counters(self):
+        """Профиль показывает значения счётчиков."""
+        Post.objects.create(author=self.user, text='Пост')
+        Counter.objects.filter(kind=Counter.AUTHOR_POSTS).update(value=42)
+        response = self.client.get('/profile/auth/')
+        self.assertEqual(response.context['count_all_posts'], 42)
+
+    def test_reconcile_in_batches(self):
+        """Пересчёт диапазонами id исправляет все расхождения."""
+        authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for number, author in enumerate(authors):
+            for _ in range(number + 1):
+                Post.objects.create(author=author, text='Пост')
+        Counter.objects.filter(kind=Counter.AUTHOR_POSTS).delete()
+        Counter.objects.create(
+            kind=Counter.AUTHOR_POSTS, object_id=10 ** 6, value=3
+        )
+        self.assertEqual(reconcile(batch_size=2), 6)
+        for number, author in enumerate(authors):
+            self.assertEqual(
+                get_count(Counter.AUTHOR_POSTS, author.pk), number + 1
+            )
+        self.assertFalse(Counter.objects.filter(object_id=10 ** 6).exists())
+        self.assertEqual(reconcile(batch_size=2), 0)
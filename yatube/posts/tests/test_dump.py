@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+
+from .. import dump, seed
+from ..counters import get_count
+from ..models import Comment, Counter, Follow, Group, Post, StoredFile
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DumpRestoreTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        seed.generate(
+            users=6, groups=3, posts=40, follows=12, comments=30,
+            images=0.3,
+        )
+
+    def snapshot(self):
+        return {
+            model: list(
+                model.objects.order_by('pk')
+                .values_list(*dump._attnames(model))
+            )
+            for model in dump.MODELS
+        }
+
+    def clear(self):
+        for model in dump.MODELS:
+            model.objects.all().delete()
+
+    def test_dump_and_restore(self):
+        """Загрузка дампа восстанавливает строки, индексы и счётчики."""
+        before = self.snapshot()
+        call_command(
+            'dump_site', self.directory, part_size=7, stdout=StringIO()
+        )
+        self.assertGreater(
+            len([name for name in os.listdir(self.directory)
+                 if name.startswith('posts.post-')]),
+            1,
+        )
+        self.clear()
+        call_command('restore_site', self.directory, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn('post_date_idx', dump._index_names(Post))
+        post = Post.objects.first()
+        self.assertEqual(
+            get_count(Counter.AUTHOR_POSTS, post.author_id),
+            Post.objects.filter(author_id=post.author_id).count(),
+        )
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, dump.STATE)
+        ))
+
+    def test_restore_resumes(self):
+        """После сбоя загрузка продолжается с незагруженных частей."""
+        before = self.snapshot()
+        dump.dump(self.directory, part_size=7)
+        self.clear()
+        load_part = dump.Restore.load_part
+        calls = []
+
+        def crash(restore, entry, part):
+            calls.append(part['file'])
+            if len(calls) == 4:
+                raise RuntimeError('Сбой')
+            load_part(restore, entry, part)
+
+        with mock.patch.object(dump.Restore, 'load_part', crash):
+            with self.assertRaises(RuntimeError):
+                dump.restore(self.directory)
+        self.assertEqual(Group.objects.count(), len(before[Group]))
+        self.assertLess(Post.objects.count(), len(before[Post]))
+        loaded = []
+        with mock.patch.object(
+            dump.Restore, 'load_part',
+            lambda restore, entry, part: (
+                loaded.append(part['file']),
+                load_part(restore, entry, part),
+            ),
+        ):
+            dump.restore(self.directory)
+        self.assertNotIn(calls[0], loaded)
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn('comment_post_created_idx', dump._index_names(Comment))
+        self.assertIn('follow_author_user_idx', dump._index_names(Follow))
+
+    def test_incomplete_dump(self):
+        """Дамп без манифеста не загружается."""
+        with self.assertRaises(CommandError):
+            call_command('restore_site', self.directory, stdout=StringIO())
+        self.assertTrue(StoredFile.objects.exists())
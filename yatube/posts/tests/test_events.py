@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import events
+from ..models import Follow, Group, Post, PostEvent
+
+User = get_user_model()
+
+
+@override_settings(
+    EVENTS_POLL_INTERVAL=0, EVENTS_HEARTBEAT=0.01, EVENTS_STREAM_TIMEOUT=0.05
+)
+class PostEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.hub = events.Hub()
+        patcher = mock.patch.object(events, 'hub', self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def listen(self, response, *posts):
+        """Создаёт посты после начала потока и читает его до конца."""
+        stream = response.streaming_content
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        for author, group in posts:
+            Post.objects.create(author=author, text='Пост', group=group)
+        return b''.join(stream).decode()
+
+    def delivered(self, body):
+        return [
+            line for line in body.splitlines() if line.startswith('data: ')
+        ]
+
+    def test_index_stream(self):
+        """Новый пост приходит событием, пустой поток — пульсом."""
+        response = self.client.get(reverse('posts:events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = self.listen(response, (self.author, None))
+        post = Post.objects.get()
+        event = PostEvent.objects.get()
+        self.assertIn(f'id: {event.pk}\nevent: post\n', body)
+        self.assertIn(f'"post": {post.pk}', body)
+        self.assertIn(reverse('posts:post_detail', args=(post.pk,)), body)
+        self.assertEqual(len(self.delivered(body)), 1)
+        body = self.listen(self.client.get(reverse('posts:events')))
+        self.assertIn(': ping\n\n', body)
+        self.assertEqual(self.hub.connections, 0)
+
+    def test_group_stream(self):
+        """Поток группы получает только её посты."""
+        response = self.client.get(
+            reverse('posts:group_events', args=(self.group.slug,))
+        )
+        body = self.listen(
+            response, (self.author, None), (self.other, self.group)
+        )
+        self.assertEqual(len(self.delivered(body)), 1)
+        self.assertIn('"group": "group"', body)
+        response = self.client.get(
+            reverse('posts:group_events', args=('missing',))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_stream(self):
+        """Поток подписок получает посты только тех, на кого подписан."""
+        response = self.client.get(reverse('posts:follow_events'))
+        self.assertEqual(response.status_code, 403)
+        response = self.reader_client.get(reverse('posts:follow_events'))
+        body = self.listen(response, (self.author, None), (self.other, None))
+        self.assertEqual(len(self.delivered(body)), 1)
+        self.assertIn('"author": "author"', body)
+        Follow.objects.create(user=self.reader, author=self.other)
+        response = self.reader_client.get(reverse('posts:follow_events'))
+        body = self.listen(response, (self.other, None))
+        self.assertIn('"author": "other"', body)
+
+    def test_resume(self):
+        """С Last-Event-ID поток отдаёт пропущенные события."""
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        first, *missed = PostEvent.objects.order_by('id')
+        response = self.client.get(
+            reverse('posts:events'), HTTP_LAST_EVENT_ID=str(first.pk)
+        )
+        body = self.listen(response)
+        self.assertEqual(
+            [line for line in body.splitlines() if line.startswith('id: ')],
+            [f'id: {event.pk}' for event in missed],
+        )
+
+    @override_settings(EVENTS_POLL_INTERVAL=60)
+    def test_resume_without_events(self):
+        """Курсор без событий за ним не превращает поток в опрос таблицы."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        event = PostEvent.objects.get()
+        self.hub.head()
+        post.delete()
+        for cursor in (event.pk - 1, -1):
+            with self.subTest(cursor=cursor), mock.patch.object(
+                events, 'fetch', wraps=events.fetch
+            ) as fetch:
+                body = self.listen(self.client.get(
+                    reverse('posts:events'), {'last_event_id': cursor}
+                ))
+                self.assertIn(': ping\n\n', body)
+                self.assertLess(fetch.call_count, 10)
+
+    @override_settings(EVENTS_MAX_CONNECTIONS=1)
+    def test_connection_limit(self):
+        """Сверх предела соединений процесс отвечает 503."""
+        response = self.client.get(reverse('posts:events'))
+        refused = self.client.get(reverse('posts:events'))
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn('Retry-After', refused)
+        self.listen(response)
+        response = self.client.get(reverse('posts:events'))
+        self.assertEqual(response.status_code, 200)
+        self.listen(response)
+        self.assertEqual(self.hub.connections, 0)
+        self.assertEqual(self.hub.rejected, 1)
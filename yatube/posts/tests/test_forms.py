@@ -1,10 +1,13 @@
 import shutil
+import struct
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post, User
 
@@ -73,7 +76,115 @@ class PostFormTests(TestCase):
         post = Post.objects.first()
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.user)
-        self.assertEqual(post.image.name, 'posts/' + form_data['image'].name)
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertTrue(post.image.name.endswith('.gif'))
+
+    def make_image(self, size, image_format='JPEG'):
+        exif = Image.Exif()
+        exif[0x010e] = 'Описание с телефона'
+        exif[0x010f] = 'SecretCam'
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, image_format, exif=exif)
+        return SimpleUploadedFile(
+            name=f'photo.{image_format.lower()}',
+            content=buffer.getvalue(),
+            content_type=f'image/{image_format.lower()}'
+        )
+
+    def make_mpo(self, size):
+        """Снимок MPO, как с камеры телефона: JPEG и второй кадр за ним."""
+        first = self.make_image(size).read()
+        buffer = BytesIO()
+        Image.new('RGB', size, 'blue').save(buffer, 'JPEG')
+        second = buffer.getvalue()
+
+        def app2(first_size, second_offset):
+            entries = struct.pack('>IIIHH', 0x20030000, first_size, 0, 0, 0)
+            entries += struct.pack(
+                '>IIIHH', 0x00020002, len(second), second_offset, 0, 0
+            )
+            ifd = struct.pack('>H', 3)
+            ifd += struct.pack('>HHI4s', 0xB000, 7, 4, b'0100')
+            ifd += struct.pack('>HHII', 0xB001, 4, 1, 2)
+            ifd += struct.pack('>HHII', 0xB002, 7, 32, 8 + 2 + 12 * 3 + 4)
+            ifd += struct.pack('>I', 0)
+            body = b'MPF\x00MM\x00\x2a' + struct.pack('>I', 8) + ifd
+            body += entries
+            return b'\xff\xe2' + struct.pack('>H', len(body) + 2) + body
+
+        # Сегмент APP2 встаёт сразу после SOI; смещение второго кадра
+        # отсчитывается от заголовка TIFF внутри сегмента.
+        first_size = len(first) + len(app2(0, 0))
+        segment = app2(first_size, first_size - 2 - 8)
+        return SimpleUploadedFile(
+            name='photo.jpg',
+            content=first[:2] + segment + first[2:] + second,
+            content_type='image/jpeg',
+        )
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_mpo_saved_as_jpeg(self):
+        """Снимок MPO уменьшается и сохраняется JPEG без EXIF."""
+        upload = self.make_mpo((300, 150))
+        with Image.open(upload) as image:
+            self.assertEqual(image.format, 'MPO')
+            self.assertTrue(image.is_animated)
+        upload.seek(0)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Стерео', 'image': upload},
+        )
+        post = Post.objects.get(text='Стерео')
+        with open(post.image.path, 'rb') as saved:
+            self.assertNotIn(b'SecretCam', saved.read())
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_image_downscaled_without_exif(self):
+        """Оригинал уменьшается и сохраняется без EXIF."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.make_image((300, 150))},
+        )
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_png_saved_without_exif(self):
+        """EXIF убирается и из PNG."""
+        upload = self.make_image((30, 30), 'PNG')
+        with Image.open(upload) as image:
+            self.assertIn('exif', image.info)
+        upload.seek(0)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Снимок', 'image': upload},
+        )
+        post = Post.objects.get(text='Снимок')
+        self.assertTrue(post.image.name.endswith('.png'))
+        with open(post.image.path, 'rb') as saved:
+            content = saved.read()
+        self.assertNotIn(b'SecretCam', content)
+        with Image.open(post.image.path) as image:
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_oversized_image_rejected(self):
+        """Картинка больше допустимого числа пикселей отклоняется."""
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.make_image((20, 20))},
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение слишком большое: не больше 100 пикселей.'
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
 
     def test_create_anonim_form(self):
         """Валидная форма создает запись в Post от
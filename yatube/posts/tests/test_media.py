@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, StoredFile
+from core import thumbnails
+from core.storage import is_hashed
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class HashedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, filename):
+        return Post.objects.create(
+            author=self.user,
+            text=filename,
+            image=SimpleUploadedFile(
+                name=filename, content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом со счётчиком ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name = first.image.name
+        self.assertTrue(is_hashed(name))
+        self.assertTrue(name.startswith('posts/'))
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        with mock.patch(
+            'posts.media.transaction.on_commit', lambda func: func()
+        ):
+            Post.objects.get(pk=first.pk).delete()
+            self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+            self.assertTrue(first.image.storage.exists(name))
+            Post.objects.get(pk=second.pk).delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(first.image.storage.exists(name))
+
+    def test_relocate_images(self):
+        """Команда переносит файлы старой раскладки и переписывает пути."""
+        legacy = FileSystemStorage().save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF)
+        )
+        posts = [
+            Post.objects.create(author=self.user, text=f'Старый {i}')
+            for i in range(3)
+        ]
+        Post.objects.filter(
+            pk__in=[post.pk for post in posts]
+        ).update(image=legacy)
+        call_command('relocate_images', batch_size=2, stdout=StringIO())
+        names = set(
+            Post.objects.filter(
+                pk__in=[post.pk for post in posts]
+            ).values_list('image', flat=True)
+        )
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_hashed(name))
+        self.assertTrue(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_MEDIA_ROOT, legacy))
+        )
+        self.assertEqual(StoredFile.objects.get(name=name).references, 3)
+
+    def test_image_metadata_stored(self):
+        """Размеры и заглушка считаются при загрузке и попадают в шаблон."""
+        post = self.create_post('meta.gif')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertRegex(post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        # Пока миниатюр нет, показывается оригинал с теми же данными.
+        response = self.client.get(url)
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertContains(response, post.image_placeholder)
+        thumbnails.queue.submit(post.image)
+        response = self.client.get(url)
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, post.image_placeholder)
+
+    def test_backfill_image_metadata(self):
+        """Команда заполняет данные картинок у старых постов."""
+        post = self.create_post('old.gif')
+        missing = Post.objects.create(author=self.user, text='Без файла')
+        Post.objects.filter(pk__in=[post.pk, missing.pk]).update(
+            image_width=None, image_height=None, image_color='',
+            image_placeholder='',
+        )
+        Post.objects.filter(pk=missing.pk).update(image='posts/missing.gif')
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('Обработано картинок: 1, пропущено: 1', out.getvalue())
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder)
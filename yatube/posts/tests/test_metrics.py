@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from core import metrics
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+
+    def timing(self, response):
+        return {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing_header(self):
+        """Ответ несёт запросы, шаблоны и события кеша в Server-Timing."""
+        timing = self.timing(self.client.get(reverse('posts:index')))
+        self.assertRegex(timing['db'], r'^db;dur=[\d.]+;desc="[1-9]\d* ')
+        self.assertGreater(float(timing['tpl'].split('=')[1]), 0)
+        self.assertIn('total', timing)
+        self.assertEqual(timing['page_miss'], 'page_miss;desc="1"')
+        self.assertEqual(timing['card_miss'], 'card_miss;desc="1"')
+        timing = self.timing(self.client.get(reverse('posts:index')))
+        self.assertEqual(timing['page_hit'], 'page_hit;desc="1"')
+        self.assertNotIn('page_miss', timing)
+
+    def test_metrics_endpoint(self):
+        """Гистограмма по представлениям и кеш отдаются для Prometheus."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 3',
+            text,
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 3',
+            text,
+        )
+        self.assertIn(
+            'yatube_events_total{view="posts:index",event="page_hit"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_page_cache_total{namespace="index",outcome="miss"}', text
+        )
+        self.assertIn('yatube_thumbnail_queue_depth 0', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_forbidden(self):
+        """Чужим адресам замеры не отдаются."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
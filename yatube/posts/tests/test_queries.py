@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import views
+from ..models import Comment, Follow, Group, Post
+from core.queries import RepeatedQueries, fingerprint, query_budget
+
+User = get_user_model()
+comments_page = views.comments_page
+
+
+def comments_without_authors(request, post_id):
+    """Страница комментариев без select_related: авторы по одному."""
+    page = comments_page(request, post_id)
+    for comment in page:
+        comment._state.fields_cache.pop('author', None)
+    return page
+
+
+class RepeatedQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(6):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text='Комментарий',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_fingerprint(self):
+        """Отпечаток не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = %s AND name = \'a\''),
+            fingerprint('SELECT *  FROM t\nWHERE id = 7 AND name = \'b\''),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id IN (...)',
+        )
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=3)
+    def test_repeat_logged_with_template_line(self):
+        """N+1 в шаблоне попадает в журнал со строкой шаблона."""
+        with mock.patch.object(
+            views, 'comments_page', comments_without_authors
+        ), self.assertLogs('core.queries', 'WARNING') as logs:
+            self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        self.assertEqual(len(logs.output), 1)
+        # Шесть авторов комментариев и текущий пользователь из сессии.
+        self.assertIn('7 раз', logs.output[0])
+        self.assertIn('includes/comment_item.html:4', logs.output[0])
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=3, QUERY_REPEAT_RAISE=True)
+    def test_repeat_raises(self):
+        """С QUERY_REPEAT_RAISE повтор запроса поднимает ошибку."""
+        with mock.patch.object(
+            views, 'comments_page', comments_without_authors
+        ), self.assertRaises(RepeatedQueries):
+            self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+
+    @query_budget({
+        'posts:index': 3,
+        'posts:group_list': 5,
+        'posts:profile': 6,
+        'posts:post_detail': 6,
+        'posts:follow_index': 3,
+    })
+    def test_pages_within_budget(self):
+        """Страницы укладываются в бюджет запросов без повторов."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_budget_exceeded(self):
+        """Превышение бюджета роняет тест."""
+        @query_budget({'posts:index': 1})
+        def check(case):
+            case.client.get(reverse('posts:index'))
+
+        with self.assertRaises(AssertionError):
+            check(self)
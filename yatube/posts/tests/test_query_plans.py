@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def full_scans(plan):
+    """Шаги плана с полным просмотром таблицы или сортировкой."""
+    return [
+        detail for detail in plan
+        if 'TEMP B-TREE' in detail
+        or (detail.startswith('SCAN') and 'INDEX' not in detail)
+    ]
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_THRESHOLD=0)
+class QueryPlanTest(TestCase):
+    """Каждый запрос представлений должен идти по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(15)
+        ]
+        for i in range(25):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Ком {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400)
+        next_cursor = getattr(
+            response.context and response.context.get('page_obj'),
+            'next_cursor', None
+        )
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'sqlite_stat1' in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(full_scans(plan), [], plan)
+        return next_cursor
+
+    def test_listing_plans(self):
+        """Первые и следующие страницы списков идут по индексам."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            next_cursor = self.assert_indexed('get', url)
+            self.assert_indexed('get', url, {'cursor': next_cursor})
+            self.assert_indexed('get', url, {'page': 2})
+
+    def test_follow_engine_plans(self):
+        """Движки ленты подписок идут по индексам.
+
+        Движок 'join' не проверяется: это исходный запрос, оставленный
+        для сравнения, он сортирует результат соединения.
+        """
+        for engine in ('timeline', 'merge'):
+            with self.settings(FOLLOW_FEED_ENGINE=engine):
+                cache.clear()
+                self.assert_indexed('get', reverse('posts:follow_index'))
+
+    def test_post_detail_plans(self):
+        """Страница поста и подгрузка комментариев идут по индексам."""
+        post_id = self.posts[0].id
+        self.assert_indexed(
+            'get', reverse('posts:post_detail', kwargs={'post_id': post_id})
+        )
+        self.assert_indexed(
+            'get', reverse('posts:comment_list', kwargs={'post_id': post_id})
+        )
+
+    def test_write_plans(self):
+        """Запросы при публикации, комментарии и подписке идут по индексам."""
+        self.assert_indexed(
+            'post', reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assert_indexed(
+            'post',
+            reverse(
+                'posts:add_comment', kwargs={'post_id': self.posts[1].id}
+            ),
+            {'text': 'Комментарий'},
+        )
+        for name in ('posts:profile_unfollow', 'posts:profile_follow'):
+            self.assert_indexed(
+                'get', reverse(name, kwargs={'username': 'auth'})
+            )
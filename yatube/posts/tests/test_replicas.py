@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections, router
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import routers
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TransactionTestCase):
+    # В TestCase всё идёт внутри транзакции и читается из основной базы.
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get(self, url):
+        """Ответ и число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get(url)
+        return response, len(primary), len(replica)
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_reads_go_to_replica(self):
+        """Страницы читают данные из реплики."""
+        response, primary, replica = self.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    @override_settings(REPLICA_PIN_SECONDS=60)
+    def test_pinned_after_write(self):
+        """После записи посетитель читает из основной базы."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        self.assertEqual(
+            response.cookies[routers.PIN_COOKIE]['max-age'], 60
+        )
+        response, primary, replica = self.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertContains(response, 'Комментарий')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_router(self):
+        """Запись в запросе закрепляет его чтение за основной базой."""
+        self.assertEqual(router.db_for_read(Post), 'default')
+        token = routers._current.set(routers.Pin(False))
+        self.addCleanup(routers._current.reset, token)
+        self.assertEqual(router.db_for_read(Post), 'replica1')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+    def test_replicate(self):
+        """Снимок основной базы копируется в файл реплики."""
+        directory = tempfile.mkdtemp()
+        target = os.path.join(directory, 'replica.sqlite3')
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, target)
+        routers.copy_primary(target)
+        with closing(sqlite3.connect(target)) as copy:
+            self.assertEqual(
+                copy.execute('SELECT text FROM posts_post').fetchall(),
+                [('Пост',)],
+            )
+        # В тестах реплики указывают на ту же базу, что и основная.
+        with self.assertRaises(CommandError):
+            call_command('replicate', 'replica1', stdout=StringIO())
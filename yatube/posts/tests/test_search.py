@@ -0,0 +1,96 @@
+import base64
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.relevant = Post.objects.create(
+            author=cls.user, text='Котики котики котики и собаки'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Про котика одно слово, остальное о погоде '
+            'и о том, как прошёл длинный день на работе'
+        )
+        Post.objects.create(author=cls.user, text='Только собаки')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_search_ranks_by_relevance(self):
+        """Поиск возвращает посты в порядке релевантности bm25."""
+        self.assertEqual(list(self.search('котики')), [self.relevant])
+        Post.objects.filter(pk=self.other.pk).update(text='котики')
+        call_command('rebuild_search_index', stdout=StringIO())
+        page_obj = self.search('котики')
+        self.assertEqual(list(page_obj), [self.other, self.relevant])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.relevant.pk)
+        post.text = 'Теперь про енотов'
+        post.save()
+        self.assertEqual(list(self.search('котики')), [])
+        self.assertEqual(list(self.search('енотов')), [post])
+        post.delete()
+        self.assertEqual(list(self.search('енотов')), [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_cursor_pagination(self):
+        """Результаты поиска листаются по курсору с сохранением запроса."""
+        first = self.search('собаки')
+        self.assertEqual(first.number, 1)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'собаки'}
+        )
+        self.assertContains(response, 'q=%D1%81%D0%BE%D0%B1%D0%B0%D0%BA')
+        second = self.search('собаки', cursor=first.next_cursor)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(list(first), list(second))
+        self.assertIsNone(second.next_cursor)
+
+    def test_forged_cursor_out_of_range(self):
+        """Курсор с огромным id открывает первую страницу, а не 500."""
+        payload = json.dumps(['next', 2, [1.0, 2 ** 70]])
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        page_obj = self.search('собаки', cursor=cursor)
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(len(page_obj), 2)
+
+    def test_search_handles_fts_syntax(self):
+        """Кавычки и операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(list(self.search('"котики AND (')), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/posts/post/', {'q': 'котики'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.relevant]
+        )
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from .. import seed
+from ..counters import get_count
+from ..models import (
+    Comment, Counter, Follow, Group, Post, StoredFile, TimelineEntry, User
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_dataset(self):
+        """Наполнение создаёт данные с разными датами и счётчиками."""
+        seed.generate(
+            users=5, groups=2, posts=30, follows=8, comments=40,
+            images=0, chunk_size=7,
+        )
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 8)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+        post = Post.objects.first()
+        self.assertEqual(
+            get_count(Counter.AUTHOR_POSTS, post.author_id),
+            Post.objects.filter(author_id=post.author_id).count(),
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_skew_and_dates(self):
+        """Подписчики сосредоточены у немногих, комментарии после постов."""
+        seed.generate(
+            users=100, groups=5, posts=300, follows=1000, comments=500,
+            images=0,
+        )
+        followers = sorted(
+            Follow.objects.values('author').annotate(total=Count('pk'))
+            .values_list('total', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(sum(followers[:10]), sum(followers) / 3)
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_deterministic(self):
+        """Одинаковое зерно даёт одинаковые данные."""
+        def snapshot():
+            seed.generate(
+                users=10, groups=2, posts=40, follows=20, comments=30,
+                images=0, seed=7,
+            )
+            rows = (
+                list(Post.objects.order_by('pk').values_list(
+                    'author__username', 'group__slug', 'text'
+                )),
+                list(Follow.objects.order_by('pk').values_list(
+                    'user__username', 'author__username'
+                )),
+                list(Comment.objects.order_by('pk').values_list(
+                    'author__username', 'text'
+                )),
+            )
+            User.objects.all().delete()
+            Group.objects.all().delete()
+            return rows
+
+        self.assertEqual(snapshot(), snapshot())
+
+    def test_images_shared_and_counted(self):
+        """Картинки постов берутся из пула и учтены в StoredFile."""
+        call_command(
+            'seed', users=5, groups=1, posts=50, follows=5, comments=5,
+            images=0.5, stdout=StringIO(),
+        )
+        with_images = Post.objects.exclude(image='')
+        self.assertTrue(with_images.exists())
+        self.assertFalse(with_images.filter(image_width=None).exists())
+        self.assertEqual(
+            sum(StoredFile.objects.values_list('references', flat=True)),
+            with_images.count(),
+        )
@@ -1,15 +1,29 @@
+import base64
+import json
+import os
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post, Comment, Follow
+from core import thumbnails
+from core.cache import stats as cache_stats
+from core.utils import CursorPaginator, cheap_count
+
+from .. import feeds
+from ..templatetags.post_cards import post_cards
+from ..models import Group, Post, Comment, Follow, TimelineEntry
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -224,13 +238,56 @@ class PostContextTest(TestCase):
             reverse('posts:index')
         )
         test_page1 = response1.content
-        Post.objects.get(id=1).delete()
+        # update() не вызывает сигналов, поэтому версия кеша не меняется.
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый текст')
         response2 = self.guest_client.get(
             reverse('posts:index')
         )
         test_page2 = response2.content
         self.assertEqual(test_page1, test_page2)
 
+    def test_post_delete_invalidates_cached_pages(self):
+        """Удаление поста сбрасывает кеш страниц со списками постов"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        cached = {page: self.guest_client.get(page).content for page in pages}
+        Post.objects.create(author=self.user, text='Ещё пост').delete()
+        self.assertEqual(
+            cached[pages[1]], self.guest_client.get(pages[1]).content
+        )
+        Post.objects.get(pk=self.post.pk).delete()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertNotEqual(cached[page], response.content)
+
+    def test_cache_hit_miss_counters(self):
+        """Попадания и промахи кеша считаются по пространствам имён"""
+        hits = cache_stats['index', 'hit']
+        misses = cache_stats['index', 'miss']
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(cache_stats['index', 'miss'], misses + 1)
+        self.assertEqual(cache_stats['index', 'hit'], hits + 1)
+
+    def test_post_cards_fragment_cache(self):
+        """Карточка поста берётся из кеша до правки поста или группы"""
+        post_cards([Post.objects.get(pk=self.post.pk)], 'index')
+        Post.objects.filter(pk=self.post.pk).update(text='Скрытая правка')
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertNotIn('Скрытая правка', post_cards([post], 'index')[0])
+        post.save()
+        self.assertIn('Скрытая правка', post_cards([post], 'index')[0])
+        Group.objects.filter(pk=self.group.pk).update(slug='new-slug')
+        self.assertNotIn('new-slug', post_cards([post], 'index')[0])
+        Group.objects.get(pk=self.group.pk).save()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIn('new-slug', post_cards([post], 'index')[0])
+        Group.objects.filter(pk=self.group.pk).update(slug=self.group.slug)
+
     def test_clear_cache_index_page(self):
         """Тест очистки кеша на странице index"""
         response1 = self.guest_client.get(
@@ -310,8 +367,85 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj'].object_list), 4
                 )
 
+    def test_cursor_paginator(self):
+        """Проверяем переход по курсорам вперёд и назад."""
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = list(response.context['page_obj'])
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj.object_list), 4)
+        self.assertIsNone(page_obj.next_cursor)
+        self.assertFalse(set(first_page) & set(page_obj.object_list))
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.previous_cursor}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj'].object_list), 10)
+
+    def test_forged_cursor_out_of_range(self):
+        """Курсор с огромным id открывает первую страницу, а не 500."""
+        payload = json.dumps(
+            ['next', 2, [self.test_posts[0].pub_date.isoformat(), 10 ** 30]]
+        )
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': cursor}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        response = self.guest_client.get(
+            reverse('posts:api_posts'), {'cursor': cursor}
+        )
+        self.assertEqual(len(response.json()['results']), 10)
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_page_past_end_shows_last_page(self):
+        """Номер страницы за концом списка открывает последнюю."""
+        for page in (3, 99, 1000):
+            with self.subTest(page=page):
+                cache.clear()
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'page': page}
+                )
+                page_obj = response.context['page_obj']
+                self.assertEqual(page_obj.number, 2)
+                self.assertEqual(len(page_obj.object_list), 4)
+
+    def test_elided_page_window(self):
+        """Окно навигации: края и по три страницы вокруг текущей."""
+        paginator = CursorPaginator(Post.objects.all(), 10, count=1000)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, '…', 47, 48, 49, 50, 51, 52, 53, '…', 100],
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].page_window, [1, 2])
+
+    @override_settings(PAGINATOR_EXACT_COUNT_THRESHOLD=5)
+    def test_cheap_count_cached_above_threshold(self):
+        """Большие выборки считаются раз в PAGINATOR_COUNT_TIMEOUT."""
+        posts = Post.objects.filter(author=self.user)
+        self.assertEqual(cheap_count(posts), 14)
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(cheap_count(posts), 14)
+        with self.settings(PAGINATOR_EXACT_COUNT_THRESHOLD=100):
+            cache.clear()
+            self.assertEqual(cheap_count(posts), 15)
+            Post.objects.create(author=self.user, text='Ещё пост')
+            self.assertEqual(cheap_count(posts), 16)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostImageTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -341,6 +475,8 @@ class PostImageTests(TestCase):
             group=cls.group,
             image=cls.uploaded,
         )
+        # В TestCase on_commit не срабатывает: нарезаем сами.
+        thumbnails.queue.submit(cls.post.image)
 
     @classmethod
     def tearDownClass(cls):
@@ -370,6 +506,104 @@ class PostImageTests(TestCase):
                     response.context['page_obj'][0].image, self.post.image
                 )
 
+    def test_thumbnails_resolved_in_batch(self):
+        """Миниатюры страницы читаются из хранилища одним запросом."""
+        for i in range(3):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Картинка {i}',
+                image=SimpleUploadedFile(
+                    name=f'batch{i}.gif',
+                    content=self.small_gif,
+                    content_type='image/gif',
+                ),
+            )
+            thumbnails.queue.submit(post.image)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1, kvstore_queries)
+        posts = response.context['page_obj']
+        for post in posts:
+            with self.subTest(post=post.text):
+                self.assertContains(response, post.thumbnail.url)
+                self.assertContains(response, post.srcset['jpeg'])
+                self.assertEqual(post.srcset['jpeg'].count('w,'), 1)
+
+    def test_unreadable_image_not_retried(self):
+        """Пропавший исходник ставится в очередь один раз и не ищется снова."""
+        Post.objects.filter(pk=self.post.pk).update(image='posts/missing.gif')
+        post = Post.objects.get(pk=self.post.pk)
+        specs = thumbnails.variants()
+        with mock.patch.object(
+            thumbnails.queue, 'submit', wraps=thumbnails.queue.submit
+        ) as submit, mock.patch(
+            'core.thumbnails.transaction.on_commit', lambda func: func()
+        ):
+            with self.assertLogs('sorl.thumbnail', 'ERROR'):
+                resolved = thumbnails.resolve([post.image], specs)
+            self.assertEqual(submit.call_count, 1)
+            self.assertFalse(
+                any(thumbnail.size for thumbnail in resolved[post.image.name])
+            )
+            with self.assertNumQueries(0):
+                thumbnails.resolve([post.image], specs)
+            self.assertEqual(submit.call_count, 1)
+
+    def card(self, text):
+        """Карточка поста с текстом text на главной."""
+        content = self.guest_client.get(reverse('posts:index')).content
+        cards = content.decode().split('<article')
+        return next(card for card in cards if text in card)
+
+    def test_cards_refreshed_when_thumbnails_ready(self):
+        """Карточка без миниатюры обновляется, когда их нарезали."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Картинка в очереди',
+            image=SimpleUploadedFile(
+                name='queued.gif',
+                content=self.small_gif.replace(b'\xFF' * 3, b'\xFE' * 3, 1),
+                content_type='image/gif',
+            ),
+        )
+        with mock.patch.object(thumbnails.queue, 'submit') as submit, \
+                mock.patch('core.thumbnails.transaction.on_commit') as later:
+            card = self.card(post.text)
+        # Загрузка уже пометила картинку: показ не ставит её снова.
+        later.assert_not_called()
+        submit.assert_not_called()
+        self.assertIn(f'src="{post.image.url}"', card)
+        self.assertNotIn('srcset', card)
+        thumbnails.queue.submit(post.image)
+        self.assertIn('srcset', self.card(post.text))
+
+    def test_thumbnails_generated_on_upload(self):
+        """Миниатюры нарезаются после загрузки, а не при показе."""
+        generated = thumbnails.queue.metrics()['generated']
+        uploaded = SimpleUploadedFile(
+            name='eager.gif', content=self.small_gif, content_type='image/gif'
+        )
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ):
+            post = Post.objects.create(
+                author=self.user, text='Пост с картинкой', image=uploaded
+            )
+            post.text = 'Правка без новой картинки'
+            post.save()
+        metrics = thumbnails.queue.metrics()
+        self.assertEqual(metrics['generated'], generated + 1)
+        self.assertEqual(metrics['queue_depth'], 0)
+        cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        self.assertTrue(
+            any(files for _, _, files in os.walk(cache_dir))
+        )
+
 
 class CommentTest(TestCase):
     @classmethod
@@ -417,6 +651,37 @@ class CommentTest(TestCase):
         self.assertEqual(Comment.objects.count(), comments_count + 1)
         self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
 
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_paginated_with_cursor(self):
+        """Комментарии выводятся порциями, следующая — по курсору"""
+        for i in range(3):
+            Comment.objects.create(
+                author=self.user, post=self.post, text=f'Комментарий {i}'
+            )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 2)
+        response = self.guest_client.get(
+            reverse('posts:comment_list', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor, 'format': 'json'},
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), 2)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['comments'][-1]['text'], self.comment.text)
+
+    def test_ajax_comment_returns_fragment(self):
+        """AJAX-комментарий возвращает фрагмент вместо редиректа"""
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Быстрый комментарий'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Быстрый комментарий', response.json()['html'])
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -466,3 +731,245 @@ class FollowTest(TestCase):
         self.authorized_client.force_login(unfollower_user)
         response_2 = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotIn(self.post, response_2.context['page_obj'])
+
+    def test_timeline_fan_out_and_prune(self):
+        """Новый пост попадает в ленту подписчика,
+        отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user, post=self.post
+            ).exists()
+        )
+        new_post = Post.objects.create(author=self.post.author, text='Новый')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'auth'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_MAX_LENGTH=2, TIMELINE_TRIM_SLACK=1)
+    def test_timeline_max_length(self):
+        """Переросшие ленты обрезаются командой, а не при разносе поста."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.post.author)
+        # С постом из setUpClass в лентах по три записи: в пределах запаса.
+        for i in range(2):
+            Post.objects.create(author=self.post.author, text=f'Пост {i}')
+        self.assertEqual(feeds.trim_timelines(), 0)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 3
+        )
+        Post.objects.create(author=self.post.author, text='Пост 2')
+        out = StringIO()
+        call_command('trim_timelines', stdout=out)
+        # У каждого из двух читателей удалены только две лишние записи.
+        self.assertIn('Удалено записей из лент: 4', out.getvalue())
+        newest = list(Post.objects.order_by('-id')[:2])[::-1]
+        for user in (self.user, reader):
+            self.assertEqual(
+                list(TimelineEntry.objects.filter(user=user)
+                     .values_list('post_id', flat=True)),
+                [post.id for post in reversed(newest)],
+            )
+        self.assertEqual(feeds.trim_timelines(), 0)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.user)
+                 .values_list('post_id', flat=True)),
+            [post.id for post in reversed(newest)],
+        )
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(self.post, response.context['page_obj'])
+
+    def test_follow_feed_engines_agree(self):
+        """Все движки ленты подписок выдают одни и те же страницы."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=other)
+        for i in range(12):
+            Post.objects.create(
+                author=other if i % 2 else self.post.author, text=f'Пост {i}'
+            )
+        pages = {}
+        for engine in ('timeline', 'merge', 'join'):
+            with self.subTest(engine=engine), self.settings(
+                FOLLOW_FEED_ENGINE=engine
+            ):
+                url = reverse('posts:follow_index')
+                first = self.authorized_client.get(url).context['page_obj']
+                second = self.authorized_client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                pages[engine] = [list(first), list(second)]
+                self.assertEqual(len(second), 3)
+        self.assertEqual(pages['timeline'], pages['merge'])
+        self.assertEqual(pages['timeline'], pages['join'])
+
+    @override_settings(AUTHOR_FEED_LENGTH=2)
+    def test_author_posts_loaded_in_one_query(self):
+        """Списки авторов без кеша читаются из БД одним запросом."""
+        authors = [
+            User.objects.create_user(username=f'writer{number}')
+            for number in range(4)
+        ]
+        for author in authors:
+            for number in range(3):
+                Post.objects.create(author=author, text=f'Пост {number}')
+        author_ids = [author.pk for author in authors]
+        with self.assertNumQueries(1):
+            lists = feeds.author_posts(author_ids)
+        with mock.patch.object(feeds, '_window_functions', lambda: False):
+            self.assertEqual(feeds._load_author_posts(author_ids), lists)
+        for author in authors:
+            with self.subTest(author=author.username):
+                expected = Post.objects.filter(author=author).order_by(
+                    '-pub_date', '-id'
+                ).values_list('id', flat=True)[:2]
+                self.assertEqual(
+                    list(lists[author.pk][1::2]), list(expected)
+                )
+        with self.assertNumQueries(0):
+            self.assertEqual(feeds.author_posts(author_ids), lists)
+
+    @override_settings(FOLLOW_FEED_ENGINE='merge')
+    def test_merge_feed_tracks_new_and_deleted_posts(self):
+        """Кешированные списки авторов обновляются при изменении постов."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        new_post = Post.objects.create(author=self.post.author, text='Новый')
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        new_post.delete()
+        response = self.authorized_client.get(url)
+        self.assertNotIn(new_post, response.context['page_obj'])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def assert_not_modified(self, client, url, **headers):
+        response = client.get(url, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.templates)
+
+    def test_index_not_modified(self):
+        """Главная отвечает 304 без запросов к базе, пока нет изменений."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assert_not_modified(
+                self.guest_client, url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assert_not_modified(
+            self.guest_client, url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_vary_by_user(self):
+        """ETag различает пользователей, дата отдаётся только гостям."""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        guest = self.guest_client.get(url)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=guest['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], guest['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_post_detail_not_modified(self):
+        """Страница поста меняет ETag после нового комментария."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        self.assert_not_modified(
+            self.authorized_client, url, HTTP_IF_NONE_MATCH=etag
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_index_not_modified(self):
+        """Лента подписок меняет ETag при подписке и новом посте."""
+        url = reverse('posts:follow_index')
+        etag = self.authorized_client.get(url)['ETag']
+        self.assert_not_modified(
+            self.authorized_client, url, HTTP_IF_NONE_MATCH=etag
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SharedPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_one_copy_for_all_users(self):
+        """Гость и пользователь получают одну запись кеша со своей шапкой."""
+        url = reverse('posts:index')
+        misses = cache_stats['index', 'miss']
+        hits = cache_stats['index', 'hit']
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'reader')
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, '<!--hole:')
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = author_client.get(url)
+        self.assertContains(response, 'Пользователь: auth')
+        self.assertContains(response, 'Избранные авторы')
+        self.assertEqual(cache_stats['index', 'miss'], misses + 1)
+        self.assertEqual(cache_stats['index', 'hit'], hits + 2)
+
+    def test_follow_button_per_user(self):
+        """Кнопка подписки в общей копии профиля своя у каждого."""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        self.assertContains(self.guest_client.get(url), 'Подписаться')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Подписаться')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, events, views
 
 app_name = 'posts'
 
@@ -16,6 +16,12 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -27,4 +33,29 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('events/', events.post_events, name='events'),
+    path(
+        'events/follow/',
+        events.post_events,
+        {'follow': True},
+        name='follow_events'
+    ),
+    path(
+        'events/group/<slug:slug>/',
+        events.post_events,
+        name='group_events'
+    ),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comment_list,
+        name='api_comments'
+    ),
+    path('api/groups/<slug:slug>/', api.group_detail, name='api_group'),
+    path(
+        'api/profiles/<str:username>/',
+        api.profile_detail,
+        name='api_profile'
+    ),
 ]
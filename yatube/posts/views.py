@@ -1,13 +1,67 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db.models import OuterRef, Subquery
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
 
+from .counters import get_count, get_object_counts
+from .feeds import follow_feed_page
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-from core.utils import paginator_page
+from .models import Comment, Counter, Group, Post, User, Follow
+from .search import SearchPaginator
+from core import thumbnails
+from core.cache import cache_listing, get_versions, listing_validators
+from core.conditional import conditional_page
+from core.utils import CursorPaginator, paginator_page
 
+COMMENTS_ORDERING = ('-created', '-id')
 
-@cache_page(20, key_prefix='index_page')
+
+def comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, COMMENTS_ORDERING
+    )
+    return paginator.page_from_request(request)
+
+
+def post_validators(request, post_id):
+    """ETag и Last-Modified страницы поста одним запросом.
+
+    Учитываются правка поста, последний комментарий, счётчики
+    комментариев и постов автора, а также версия групп.
+    """
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by(*COMMENTS_ORDERING).values('created')[:1]
+    comments_count = Counter.objects.filter(
+        kind=Counter.POST_COMMENTS, object_id=OuterRef('pk')
+    ).values('value')
+    author_posts = Counter.objects.filter(
+        kind=Counter.AUTHOR_POSTS, object_id=OuterRef('author_id')
+    ).values('value')
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment),
+        comments_count=Subquery(comments_count),
+        author_posts=Subquery(author_posts),
+    ).values_list(
+        'updated', 'last_comment', 'comments_count', 'author_posts'
+    ).first()
+    if row is None:
+        return None
+    group_version, = get_versions('group')
+    last_modified = max(filter(None, row[:2]))
+    return (*row, group_version), int(last_modified.timestamp())
+
+
+def follow_validators(request):
+    return listing_validators('follow', request.user.username)
+
+
+@cache_listing('index')
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator_page(request, post_list)
@@ -17,10 +71,14 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@cache_listing('group', 'slug')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author', 'group')
-    page_obj = paginator_page(request, post_list)
+    page_obj = paginator_page(
+        request, post_list,
+        count=get_count(Counter.GROUP_POSTS, group.pk),
+    )
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -28,29 +86,38 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_listing('profile', 'username')
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     post_list = author.posts.select_related("group", "author")
-    count_all_posts = author.posts.count()
-    page_obj = paginator_page(request, post_list)
-    following = (
-        request.user.is_authenticated
-        and author.following.filter(user=request.user).exists()
+    counts = get_object_counts(
+        (Counter.AUTHOR_POSTS, Counter.FOLLOWERS, Counter.FOLLOWING),
+        author.pk,
+    )
+    page_obj = paginator_page(
+        request, post_list, count=counts[Counter.AUTHOR_POSTS]
     )
     context = {
         'page_obj': page_obj,
         'author': author,
-        'count_all_posts': count_all_posts,
-        'following': following,
+        'count_all_posts': counts[Counter.AUTHOR_POSTS],
+        'followers_count': counts[Counter.FOLLOWERS],
+        'following_count': counts[Counter.FOLLOWING],
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_validators)
 def post_detail(request, post_id):
-    unique_post = get_object_or_404(Post, pk=post_id)
-    number_of_posts = unique_post.author.posts.count()
+    unique_post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    number_of_posts = get_count(
+        Counter.AUTHOR_POSTS, unique_post.author_id
+    )
+    thumbnails.attach([unique_post])
     form = CommentForm()
-    comments = unique_post.comments.filter(post=unique_post)
+    comments = comments_page(request, post_id)
     context = {
         'unique_post': unique_post,
         'number_of_posts': number_of_posts,
@@ -60,6 +127,44 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_list(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом или JSON."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = comments_page(request, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    response = render(
+        request, 'includes/comment_list.html', {'comments': comments}
+    )
+    response['X-Next-Cursor'] = comments.next_cursor or ''
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, settings.POSTS_PER_PAGE)
+        page_obj = paginator.page_from_request(request)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -106,13 +211,20 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        if request.is_ajax():
+            html = render_to_string(
+                'includes/comment_item.html', {'comment': comment}, request
+            )
+            return JsonResponse({'id': comment.id, 'html': html}, status=201)
+    elif request.is_ajax():
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional_page(follow_validators)
 def follow_index(request):
-    follower = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_page(request, follower)
+    page_obj = follow_feed_page(request)
     context = {
         'page_obj': page_obj,
     }
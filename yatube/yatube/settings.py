@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.queries.RepeatedQueriesMiddleware',
+    'core.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,9 +92,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Реплики только для чтения: копии основной базы, которые
+    # обновляет manage.py replicate. В тестах это та же база.
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica1.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+    'replica2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica2.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Реплики, из которых читают представления, например
+# DATABASE_REPLICAS=replica1,replica2. Пока список пуст, всё
+# чтение идёт в основную базу.
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',')
+    if alias
+]
+# Столько секунд после своей записи посетитель читает из основной базы;
+# за это время реплики должны её догнать.
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,3 +174,77 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+POSTS_PER_PAGE = 10
+# Глубже этой страницы ссылки ?page=N не уходят: дальше только курсоры.
+PAGINATOR_MAX_OFFSET_PAGE = 50
+
+# Сколько последних записей хранится в ленте подписок одного пользователя.
+TIMELINE_MAX_LENGTH = 1000
+# Разнос постов ленты не обрезает: команда trim_timelines обрезает те,
+# что переросли TIMELINE_MAX_LENGTH больше чем на этот запас.
+TIMELINE_TRIM_SLACK = 100
+
+# Движок ленты подписок: 'timeline' — материализованная лента (push),
+# 'merge' — слияние кешированных списков постов авторов (pull),
+# 'join' — прямой запрос с JOIN по подпискам.
+FOLLOW_FEED_ENGINE = 'timeline'
+# В режиме 'merge' глубина ленты ограничена длиной списка автора.
+AUTHOR_FEED_LENGTH = 500
+AUTHOR_FEED_TIMEOUT = 60 * 60 * 24
+
+# Кеш страниц сбрасывается сигналами моделей, а не по времени.
+LISTING_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+COMMENTS_PER_PAGE = 20
+
+# До этого числа строк навигация считает записи точным COUNT(*),
+# выше — берёт оценку sqlite_stat1 или COUNT(*), закешированный на время.
+PAGINATOR_EXACT_COUNT_THRESHOLD = 10000
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+
+# Адреса, которым отдаются замеры на /metrics.
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Запрос, повторившийся на странице столько раз, считается N+1:
+# он пишется в журнал, а при QUERY_REPEAT_RAISE — поднимает ошибку.
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_REPEAT_RAISE = False
+
+# Поток событий о новых постах (/events/). Каждое соединение занимает
+# поток сервера, поэтому их число на процесс ограничено; лишним
+# отвечает 503. Таблица событий опрашивается раз в EVENTS_POLL_INTERVAL
+# секунд, пустые соединения получают пульс раз в EVENTS_HEARTBEAT.
+EVENTS_MAX_CONNECTIONS = 50
+EVENTS_POLL_INTERVAL = 1
+EVENTS_HEARTBEAT = 15
+# Через столько секунд поток закрывается и браузер переподключается.
+EVENTS_STREAM_TIMEOUT = 60 * 5
+# Пауза перед переподключением, мс.
+EVENTS_RETRY = 3000
+# Сколько последних событий процесс держит в памяти.
+EVENTS_BUFFER = 1000
+# События старше этого, в секундах, удаляются из таблицы.
+EVENTS_RETENTION = 60 * 60
+
+# Миниатюры нарезаются заранее в пуле потоков после загрузки картинки.
+# При THUMBNAIL_WORKERS = 0 нарезка идёт сразу после фиксации, в том же
+# потоке: так тесты с настоящими транзакциями не пишут файлы в фоне.
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE_SIZE = 100
+# Сколько секунд страницы не ищут миниатюры картинки, поставленной в
+# очередь при показе: за это время они нарезаются или исходник битый.
+THUMBNAIL_PENDING_TIMEOUT = 10 * 60
+# Размеры для srcset карточек, по возрастанию: последний идёт в src.
+THUMBNAIL_GEOMETRIES = [
+    ('480x170', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# Каждый размер нарезается во всех форматах; WebP — если его
+# поддерживает Pillow. Последний формат — запасной для <img>.
+THUMBNAIL_FORMATS = ['WEBP', 'JPEG']
+
+# Загруженный оригинал уменьшается до IMAGE_MAX_SIDE по большей
+# стороне; картинки больше IMAGE_MAX_PIXELS не принимаются вовсе.
+IMAGE_MAX_SIDE = 2560
+IMAGE_MAX_PIXELS = 40 * 10 ** 6